@@ -0,0 +1,186 @@
+import streamlit as st
+
+from dashboard.chart_cache import concurrent_charts, draw_chart
+from dashboard.charts.comunidad import (
+    etiqueta_estacion,
+    format_nombre_contaminante,
+    plot_fire_NDVI_monthly,
+    plot_fire_contaminant_monthly,
+    plot_fire_lag_response,
+    plot_graph_contaminant_boxes,
+    plot_ica_pies,
+    plot_station_series,
+)
+from dashboard.defaults import COLORES, COLUMNAS_CONTAMINANTE, COLUMNAS_ICA, COMUNIDAD, CONTAMINANTE, METODO, VENTANA
+from dashboard.ica import STATION
+from dashboard.instrumentation import debug_panel
+from dashboard.pollutants import PollutantRegistry
+from dashboard.regions import get_region, get_regions
+from dashboard.store import get_data_from_csv
+from dashboard.timeindex import get_year_index
+
+# Set the title and favicon that appear in the Browser's tab bar.
+st.set_page_config(
+    page_title='Incendios forestales en España',
+    page_icon=':earth_americas:', # This is an emoji shortcode. Could be a URL too.
+    layout='wide', 
+    initial_sidebar_state='expanded'
+)
+
+# -----------------------------------------------------------------------------
+# Load the data. Chart builders live in dashboard.charts.comunidad.
+
+# Only the partition of the chosen comunidad is read (dashboard.regions).
+try:
+    regiones = get_regions()
+except FileNotFoundError:
+    st.error(
+        "Faltan los datos por comunidad (`data/regiones/index.json`). "
+        "Genéralos con `python -m dashboard.pipeline regiones`, que necesita `data/raw/ndvi_comunidades.csv`."
+    )
+    st.stop()
+ids = sorted(regiones, key=lambda idcomunidad: regiones[idcomunidad]['nombre'])
+por_defecto = next((i for i, idcomunidad in enumerate(ids) if regiones[idcomunidad]['comunidad'] == COMUNIDAD), 0)
+with st.sidebar:
+    idcomunidad = st.selectbox("Comunidad", ids, index=por_defecto, format_func=lambda i: regiones[i]['nombre'])
+region = get_region(idcomunidad)
+
+incendios = region.incendios
+cubo_incendios = region.cube
+colores = COLORES
+
+ica = get_year_index('data/df_ica_diario.csv', 'anio', COLUMNAS_ICA, by=['Incendio', 'label'])
+bandas = get_data_from_csv('data/bandas_contaminantes.csv')
+
+# Each series is only read when the selectbox asks for it; its year index
+# answers the slider's ranges.
+contaminantes = PollutantRegistry(COLUMNAS_CONTAMINANTE)
+
+# -----------------------------------------------------------------------------
+# Draw the actual page
+#
+# Sections that depend on the sidebar filters are placeholders filled by the
+# `filtros` fragment, so changing the pollutant reruns that fragment alone and
+# leaves the NDVI chart untouched.
+
+# Set the title that appears at the top of the page.
+st.title(f"📊 Incendios forestales en {region.nombre}")
+
+if not region.calidad_aire:
+    st.subheader("NDVI medio mensual")
+    draw_chart(plot_fire_NDVI_monthly, cubo_incendios, region.ndvi_mensual, colores=colores, comunidad=region.comunidad)
+    st.info(f"Las series de calidad del aire no tienen estaciones en {region.nombre}.")
+    st.stop()
+
+st.markdown("## 🌍 Comparación días incendio durante el periodo completo")
+
+row1 = st.columns((4,3), gap='large')
+with row1[0]:
+    st.subheader("Distribución calidad aire")
+    grafico_pies = st.empty()
+
+with row1[1]:
+    seccion_cajas = st.empty()
+
+st.divider()
+st.markdown("## 📆 Datos mensuales")
+
+row2 = st.columns((1, 1), gap='large')
+with row2[0]:
+    st.subheader("NDVI medio mensual")
+    draw_chart(plot_fire_NDVI_monthly, cubo_incendios, region.ndvi_mensual, colores=colores, comunidad=region.comunidad)
+
+with row2[1]:
+    seccion_mensual = st.empty()
+
+st.divider()
+st.markdown("## ⏱️ Contaminación en los días alrededor de cada incendio")
+seccion_ventana = st.empty()
+
+st.divider()
+st.markdown("## 📈 Serie diaria por estación")
+seccion_estacion = st.empty()
+
+
+@st.fragment
+def filtros():
+    st.title("Filtros")
+    nombre_contaminante = st.selectbox("Contaminante", list(contaminantes), index=list(contaminantes).index(CONTAMINANTE))
+    
+    indice = contaminantes.index(nombre_contaminante)
+
+    # One slider per pollutant, as each covers its own years. A slider needs
+    # two distinct years; with one (or none) the whole series is shown.
+    if indice.first_year < indice.last_year:
+        from_year, to_year = st.slider(
+            'Año',
+            min_value=indice.first_year,
+            max_value=indice.last_year,
+            value=[indice.first_year, indice.last_year],
+            key=f'anios_{nombre_contaminante}')
+        st.caption('El rango de años disponible depende del contaminante.')
+    else:
+        from_year, to_year = indice.first_year, indice.last_year
+        if from_year == to_year:
+            st.caption(f'Solo hay datos de {from_year} para este contaminante.')
+        else:
+            st.caption('No hay datos de este contaminante.')
+    ventana = st.slider('Ventana (± días)', min_value=1, max_value=30, value=VENTANA)
+
+    estaciones = {
+        etiqueta_estacion(estacion): tuple(map(int, estacion))
+        for estacion in indice.frame.loc[indice.frame['PROVINCIA'].isin(region.provincias), STATION]
+        .drop_duplicates().sort_values(STATION).itertuples(index=False, name=None)
+    }
+    estacion = estaciones[st.selectbox("Estación", list(estaciones))]
+    metodo = st.radio("Reducción de puntos", ['minmax', 'lttb'], index=['minmax', 'lttb'].index(METODO),
+                      horizontal=True, format_func={'minmax': 'Mín/máx', 'lttb': 'LTTB'}.get)
+
+    with concurrent_charts():
+        # The pies only depend on the year range; an unchanged range is a
+        # spec cache hit.
+        with grafico_pies:
+            draw_chart(plot_ica_pies, ica, from_year=from_year, to_year=to_year)
+
+        with seccion_cajas.container():
+            st.subheader(f"Valores contaminante {format_nombre_contaminante(nombre_contaminante)}")
+            draw_chart(
+                plot_graph_contaminant_boxes, incendios, bandas, indice,
+                nombre_contaminante=nombre_contaminante, from_year=from_year, to_year=to_year
+            )
+
+        with seccion_mensual.container():
+            st.subheader(f"{format_nombre_contaminante(nombre_contaminante)} medio mensual")
+            draw_chart(
+                plot_fire_contaminant_monthly, cubo_incendios, indice,
+                nombre_contaminante=nombre_contaminante, colores=colores, from_year=from_year, to_year=to_year,
+                comunidad=region.comunidad
+            )
+
+        with seccion_ventana.container():
+            st.caption(
+                "Media diaria de las estaciones de la provincia de cada incendio, "
+                "promediada sobre los incendios, con su intervalo de confianza del 95 %."
+            )
+            draw_chart(
+                plot_fire_lag_response, incendios, indice.frame,
+                nombre_contaminante=nombre_contaminante, window=ventana, from_year=from_year, to_year=to_year
+            )
+
+        with seccion_estacion.container():
+            st.caption(
+                f"Media diaria de {etiqueta_estacion(estacion)}; las líneas verticales marcan los días "
+                "con incendio en su provincia. La serie se reduce en el servidor al ancho del gráfico."
+            )
+            draw_chart(
+                plot_station_series, incendios, indice,
+                nombre_contaminante=nombre_contaminante, estacion=estacion,
+                from_year=from_year, to_year=to_year, metodo=metodo
+            )
+
+    # Opt-in with ?debug=1: latency percentiles of every chart so far.
+    debug_panel()
+
+
+with st.sidebar:
+    filtros()
@@ -0,0 +1,180 @@
+"""Headless benchmark of every chart builder on synthetic data.
+
+Each builder of ``dashboard.charts`` is called directly, without Streamlit,
+on datasets generated by ``dashboard.synthetic`` at several scales. For every
+builder and scale it reports the best wall time (build plus serialization),
+the peak Python memory and the size of the serialized Vega-Lite JSON.
+
+    python -m dashboard.benchmark --scales 1 10 100 --json bench.json
+    python -m dashboard.benchmark --baseline bench.json --tolerance 0.25
+
+With ``--baseline`` the run fails (exit code 1) when a builder got slower
+than the baseline by more than ``--tolerance``.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from dashboard import geo, synthetic
+from dashboard.chart_cache import chart_to_spec, spec_to_json
+from dashboard.charts import comunidad, spain
+from dashboard.defaults import COLORES, COMUNIDAD, CONTAMINANTE, METODO, VENTANA
+from dashboard.ica import STATION
+from dashboard.pollutants import POLLUTANT_FILES
+from dashboard.rollups import FireCube
+from dashboard.timeindex import YearIndex
+
+# Series of the pollutant the regional page shows first.
+CONTAMINANTE_CSV = Path(POLLUTANT_FILES[CONTAMINANTE]).name
+
+
+def _years(df, column):
+    return {'from_year': int(df[column].min()), 'to_year': int(df[column].max())}
+
+
+# Year indexes built once per scale, like the cube, as the app builds them
+# once per file: file name -> YearIndex arguments.
+INDEXES = {
+    'df_ica_diario.csv': dict(column='anio', by=['Incendio', 'label']),
+    CONTAMINANTE_CSV: dict(column='AÑO', by=['mesdeteccion'], value='VALOR_FINAL'),
+}
+
+
+def _fire_map(df):
+    # The map reads the binary geometries, built here from the frame's CSV.
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'NDVI_previo_incendios.csv'
+        df.to_csv(path, index=False)
+        geo.build(path)
+        geometrias = geo.FireGeometries(geo.geo_path(path))
+    return spain.fire_map(geometrias, geometrias.viewport(), **_years(df, 'anio'), color='NDVI_previo')
+
+
+# name -> function(frames, cube) returning an Altair chart (or any object for
+# steps that do not produce one). ``frames`` also holds the year indexes
+# under ('index', file name).
+CASES = {
+    'FireCube.from_fires': lambda d, cube: FireCube.from_fires(d['incendios.csv']),
+    'YearIndex': lambda d, cube: YearIndex(d[CONTAMINANTE_CSV], **INDEXES[CONTAMINANTE_CSV]),
+    'spain.fires_per_reg_barchart': lambda d, cube: spain.fires_per_reg_barchart(
+        cube, cube.first_year, cube.last_year, COLORES),
+    'spain.bubbles': lambda d, cube: spain.bubbles(
+        d['merged_data.csv'], **_years(d['merged_data.csv'], 'anio')),
+    'spain.fires_per_5year': lambda d, cube: spain.fires_per_5year(
+        cube, cube.first_year, cube.last_year, COLORES),
+    'spain.fires_per_year': lambda d, cube: spain.fires_per_year(
+        cube, cube.first_year, cube.last_year, COLORES),
+    'spain.serious_fires_ndvi': lambda d, cube: spain.serious_fires_ndvi(
+        d['NDVI_mensual.csv'], cube, COLORES),
+    'spain.previous_ndvi': lambda d, cube: spain.previous_ndvi(
+        d['NDVI_previo_incendios.csv'], **_years(d['NDVI_previo_incendios.csv'], 'anio')),
+    'spain.fire_map': lambda d, cube: _fire_map(d['NDVI_previo_incendios.csv']),
+    'comunidad.plot_ica_pies': lambda d, cube: comunidad.plot_ica_pies(
+        d['index', 'df_ica_diario.csv'], **_years(d['df_ica_diario.csv'], 'anio')),
+    'comunidad.plot_graph_contaminant_boxes': lambda d, cube: comunidad.plot_graph_contaminant_boxes(
+        d['dias_incendio_andalucia.csv'], d['bandas_contaminantes.csv'], d['index', CONTAMINANTE_CSV],
+        CONTAMINANTE, **_years(d[CONTAMINANTE_CSV], 'AÑO')),
+    'comunidad.plot_fire_NDVI_monthly': lambda d, cube: comunidad.plot_fire_NDVI_monthly(
+        cube, d['NDVI_andalucia_mensual.csv'], COLORES, COMUNIDAD),
+    'comunidad.plot_fire_contaminant_monthly': lambda d, cube: comunidad.plot_fire_contaminant_monthly(
+        cube, d['index', CONTAMINANTE_CSV], CONTAMINANTE, COLORES, **_years(d[CONTAMINANTE_CSV], 'AÑO'), comunidad=COMUNIDAD),
+    'comunidad.plot_fire_lag_response': lambda d, cube: comunidad.plot_fire_lag_response(
+        d['dias_incendio_andalucia.csv'], d[CONTAMINANTE_CSV], CONTAMINANTE, VENTANA, **_years(d[CONTAMINANTE_CSV], 'AÑO')),
+    'comunidad.plot_station_series': lambda d, cube: comunidad.plot_station_series(
+        d['dias_incendio_andalucia.csv'], d['index', CONTAMINANTE_CSV], CONTAMINANTE,
+        tuple(int(v) for v in d[CONTAMINANTE_CSV][STATION].iloc[0]), **_years(d[CONTAMINANTE_CSV], 'AÑO'),
+        metodo=METODO),
+}
+
+
+def _run_once(case, frames, cube):
+    result = case(frames, cube)
+    return chart_to_spec(result) if hasattr(result, 'to_dict') else None
+
+
+def measure(case, frames, cube, repeat=3):
+    """Best wall time in seconds, peak traced memory in bytes and spec JSON bytes."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        spec = _run_once(case, frames, cube)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        _run_once(case, frames, cube)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return best, peak, len(spec_to_json(spec).encode()) if spec is not None else None
+
+
+def run(scales=(1, 10, 100), repeat=3, cases=None, out=sys.stdout):
+    """Benchmark ``cases`` (default: all) at every scale; returns one dict per measurement."""
+    results = []
+    for scale in scales:
+        frames = synthetic.generate(scale)
+        cube = FireCube.from_fires(frames['incendios.csv'])
+        frames.update({('index', name): YearIndex(frames[name], **kwargs) for name, kwargs in INDEXES.items()})
+        for name, case in CASES.items():
+            if cases and name not in cases:
+                continue
+            seconds, peak, spec_bytes = measure(case, frames, cube, repeat)
+            results.append({
+                'case': name,
+                'scale': scale,
+                'seconds': seconds,
+                'peak_bytes': peak,
+                'spec_bytes': spec_bytes,
+            })
+            print(
+                f"{name:45} {scale:>6g}x {seconds * 1000:10.1f} ms {peak / 2**20:9.1f} MiB "
+                f"{'-' if spec_bytes is None else f'{spec_bytes / 1024:.1f} KiB':>12}",
+                file=out,
+            )
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """Measurements slower than the matching baseline entry by more than ``tolerance``."""
+    reference = {(r['case'], r['scale']): r['seconds'] for r in baseline}
+    return [
+        r for r in results
+        if (r['case'], r['scale']) in reference
+        and r['seconds'] > reference[r['case'], r['scale']] * (1 + tolerance)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per measurement (default: 3)')
+    parser.add_argument('--case', action='append', help='only run this case (repeatable)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results of a previous --json run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    results = run(args.scales, args.repeat, args.case)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for r in slower:
+            print(f"REGRESSION {r['case']} at {r['scale']:g}x: {r['seconds'] * 1000:.1f} ms", file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
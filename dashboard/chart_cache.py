@@ -0,0 +1,274 @@
+"""LRU cache of rendered Vega-Lite specs shared by every session.
+
+Specs are compacted before they are cached: each DataFrame dataset keeps
+only the columns the spec refers to, and datasets with equal contents are
+merged under one name derived from their hash, so layers and concatenated
+views built from the same data ship it once.
+
+Charts drawn inside ``concurrent_charts()`` are built in a process wide
+thread pool and drawn in layout order once all of them are ready. The pool
+size comes from ``DASHBOARD_CHART_WORKERS`` (default: up to 4); ``1`` builds
+every chart in the script thread, one after another.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from dashboard.instrumentation import count_rows, timed
+
+CHART_WORKERS = int(os.environ.get('DASHBOARD_CHART_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Altair's theme and data transformer are process globals; hold this lock
+# while serializing so concurrent sessions don't step on each other.
+_altair_lock = threading.Lock()
+
+# Charts waiting to be drawn by the innermost concurrent_charts() block of
+# each script thread.
+_batch = threading.local()
+
+
+def _to_frame_dataset(data, datasets):
+    # Keep the frame itself so Streamlit ships it as Arrow, not JSON records.
+    name = f'data-{id(data):x}'
+    datasets[name] = data
+    return {'name': name}
+
+
+alt.data_transformers.register('frame_datasets', _to_frame_dataset)
+
+
+# Keys whose values name fields, and references to fields in expressions.
+_FIELD_KEYS = {'field', 'fields', 'groupby', 'pivot', 'value', 'fold', 'sort', 'key'}
+_DATUM = re.compile(r'''datum\s*(?:\.\s*([A-Za-z_$][\w$]*)|\[\s*(['"])(.*?)\2\s*\])''')
+_UNESCAPED_DOT = re.compile(r'(?<!\\)\.')
+
+
+def _add_fields(value, found):
+    if isinstance(value, str):
+        # A nested field (``a.b``) needs its top level column.
+        found.add(_UNESCAPED_DOT.split(value)[0].replace('\\.', '.'))
+    elif isinstance(value, list):
+        for item in value:
+            _add_fields(item, found)
+
+
+def _referenced_fields(node, found):
+    """Add to ``found`` every column name ``node`` (part of a spec) may read."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in _FIELD_KEYS:
+                _add_fields(value, found)
+            _referenced_fields(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            _referenced_fields(item, found)
+    elif isinstance(node, str):
+        for match in _DATUM.finditer(node):
+            found.add(match[1] or match[3])
+    return found
+
+
+def _rename_data(node, names):
+    if isinstance(node, dict):
+        data = node.get('data')
+        if isinstance(data, dict) and data.get('name') in names:
+            node['data'] = {**data, 'name': names[data['name']]}
+        for key, value in node.items():
+            if key != 'datasets':
+                _rename_data(value, names)
+    elif isinstance(node, list):
+        for item in node:
+            _rename_data(item, names)
+
+
+def _frame_digest(df):
+    digest = hashlib.sha1(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def compact_datasets(spec):
+    """Trim ``spec``'s DataFrame datasets to the columns it uses and merge equal ones."""
+    datasets = spec.get('datasets', {})
+    fields = _referenced_fields({k: v for k, v in spec.items() if k != 'datasets'}, set())
+
+    compacted, names = {}, {}
+    for name, data in datasets.items():
+        if isinstance(data, pd.DataFrame):
+            data = data[[c for c in data.columns if str(c) in fields]]
+            names[name] = f'data-{_frame_digest(data)}'
+        else:
+            names[name] = name
+        compacted.setdefault(names[name], data)
+
+    _rename_data(spec, names)
+    spec['datasets'] = compacted
+    return spec
+
+
+def chart_to_spec(chart):
+    """Serialize an Altair chart the way ``st.altair_chart`` does.
+
+    The result is a Vega-Lite spec whose top level ``datasets`` hold the
+    chart's DataFrames, compacted by ``compact_datasets``, ready for
+    ``st.vega_lite_chart``.
+    """
+    datasets = {}
+    with _altair_lock:
+        # Like Streamlit, drop Altair's default theme and its fixed sizes.
+        theme = alt.theme.enable('none') if alt.theme.active == 'default' else nullcontext()
+        with theme, alt.data_transformers.enable('frame_datasets', datasets=datasets):
+            spec = chart.to_dict()
+
+    spec['datasets'] = {**spec.get('datasets', {}), **datasets}
+    return compact_datasets(spec)
+
+
+def spec_to_json(spec):
+    """Standalone Vega-Lite JSON of ``spec``, with DataFrame datasets inlined as records."""
+    datasets = {
+        name: json.loads(data.to_json(orient='records', date_format='iso')) if hasattr(data, 'to_json') else data
+        for name, data in spec.get('datasets', {}).items()
+    }
+    return json.dumps({**spec, 'datasets': datasets}, ensure_ascii=False)
+
+
+def _data_version(data):
+    # Shared datasets carry a version that changes when their file does.
+    attrs = getattr(data, 'attrs', None)
+    return attrs.get('version') if isinstance(attrs, dict) else getattr(data, 'version', None)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class ChartSpecCache:
+    """Bounded mapping from (builder, filter values) to its built chart."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._specs)
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._specs:
+                self._specs.move_to_end(key)
+                self.hits += 1
+                return self._specs[key]
+            self.misses += 1
+
+        # Built outside the lock: two sessions asking for the same new key
+        # may both build it, which is cheaper than serializing every miss.
+        value = build()
+
+        with self._lock:
+            self._specs[key] = value
+            self._specs.move_to_end(key)
+            while len(self._specs) > self.maxsize:
+                self._specs.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+
+
+@st.cache_resource
+def get_chart_cache(maxsize=256):
+    """Process wide spec cache."""
+    return ChartSpecCache(maxsize)
+
+
+@st.cache_resource
+def get_chart_pool(workers=CHART_WORKERS):
+    """Process wide pool building the charts of ``concurrent_charts`` blocks."""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='charts')
+
+
+def chart_spec(builder, *data, **filters):
+    """Spec of ``builder(*data, **filters)``, built at most once per filter state.
+
+    ``data`` must be the process wide datasets the builder reads, which only
+    change when their files do. Everything that depends on widgets goes in
+    ``filters``: the cache key is the builder, the data versions and those
+    values.
+    """
+    return _cached_chart(builder, data, filters)[0]
+
+
+def _cached_chart(builder, data, filters, cache=None):
+    # (spec, size of its JSON) from the cache; the size is measured once, when built.
+    def build():
+        with timed('build', builder.__qualname__, rows_in=count_rows(*data)) as fields:
+            spec = chart_to_spec(builder(*data, **filters))
+            fields['rows_out'] = count_rows(*spec['datasets'].values())
+            fields['bytes'] = len(spec_to_json(spec).encode())
+        return spec, fields['bytes']
+
+    key = (builder.__code__.co_filename, builder.__qualname__, tuple(map(_data_version, data)), _freeze(filters))
+    return (cache or get_chart_cache()).get_or_build(key, build)
+
+
+def _render(container, builder, cached):
+    spec, json_bytes = cached
+    with timed('render', builder.__qualname__, rows_out=count_rows(*spec['datasets'].values()), bytes=json_bytes):
+        container.vega_lite_chart(spec, width="stretch")
+
+
+def draw_chart(builder, *data, **filters):
+    """Draw ``builder``'s chart from the spec cache.
+
+    Inside ``concurrent_charts()`` this only reserves the chart's place and
+    queues its build.
+    """
+    pending = getattr(_batch, 'pending', None)
+    if pending is None:
+        _render(st, builder, _cached_chart(builder, data, filters))
+    else:
+        # Workers have no script context: resolve the cache here.
+        future = get_chart_pool().submit(_cached_chart, builder, data, filters, get_chart_cache())
+        pending.append((st.empty(), builder, future))
+
+
+@contextmanager
+def concurrent_charts():
+    """Build the charts drawn in the block concurrently, then draw them in order.
+
+    The page's latency becomes that of its slowest chart instead of the sum
+    of all of them. Builders must not call Streamlit; nested blocks join the
+    outer one.
+    """
+    if CHART_WORKERS <= 1 or getattr(_batch, 'pending', None) is not None:
+        yield
+        return
+
+    _batch.pending = []
+    try:
+        yield
+        pending = _batch.pending
+    finally:
+        _batch.pending = None
+
+    for placeholder, builder, future in pending:
+        _render(placeholder, builder, future.result())
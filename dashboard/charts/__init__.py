@@ -0,0 +1 @@
+"""Pure chart builders, free of Streamlit side effects."""
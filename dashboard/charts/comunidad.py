@@ -0,0 +1,351 @@
+"""Chart builders for the regional page (``comunidad.py``)."""
+
+import math
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from dashboard.downsample import bucket_argmax, lttb, minmax
+from dashboard.lags import fire_windows, response_by_offset
+from dashboard.stats import boxplot_summary
+from dashboard.store import MESES
+
+# Width in pixels the daily series is downsampled to: at most about one point
+# per pixel reaches the browser, whatever the date range.
+SERIE_ANCHO = 1000
+
+
+def format_nombre_contaminante(contaminante):
+    if contaminante == 'PM10': 
+        return 'PM 10'
+    elif contaminante == 'PM25': 
+        return 'PM 2,5'
+    else: 
+        return contaminante
+
+def plot_ica_pies(indice_ica, from_year, to_year):
+    niveles = ['Buena','Razonablemente buena', 'Regular', 'Desfavorable', 'Muy desfavorable', 'Extremadamente desfavorable']
+    colores = ['#38A2CE', '#32B15E', '#F1E549', '#F28C28', '#D53441', '#A52DA4']
+
+    # Days per (Incendio, label) come from the index's per year counts.
+    agg = indice_ica.aggregate(from_year, to_year)
+    agg = agg[agg['count'] > 0].reset_index(drop=True)
+
+    agg['porcentaje'] = 100 * agg['count'] / agg.groupby('Incendio', observed=True)['count'].transform('sum')
+    agg['label'] = pd.Categorical(agg['label'], categories=niveles, ordered=True)
+    agg['label_orden'] = agg['label'].cat.codes
+    agg = agg.sort_values(['Incendio', 'label_orden']).reset_index(drop=True)
+
+    base = alt.Chart(agg).mark_arc(innerRadius=80, opacity=1).encode(
+        theta=alt.Theta(field="count", type="quantitative"),
+        color=alt.Color(
+            "label:N",
+            title="Calidad del aire",
+            scale=alt.Scale(domain=niveles, range=colores),
+            sort=niveles
+        ),
+        order=alt.Order('label_orden:Q'),
+        tooltip=[
+            alt.Tooltip('label:N', title='Nivel de calidad'),
+            alt.Tooltip('count:Q', title='Cantidad'),
+            alt.Tooltip('porcentaje:Q', format='.1f', title='Porcentaje (%)')
+        ]
+    ).properties(
+        height=250
+    )
+
+    pie = base.facet(
+        column=alt.Facet("Incendio:N", title="¿Hubo incendio?"),
+    ).configure_legend(
+        orient='bottom',
+        direction='horizontal',
+        columnPadding=20,
+        columns=3,
+        labelLimit=0   
+    )
+
+    return pie
+
+
+
+def plot_graph_contaminant_boxes(incendios, bandas, indice_contaminante, nombre_contaminante, from_year, to_year): 
+    
+    data = incendios[(incendios.anio >= from_year)&(incendios.anio <= to_year)].groupby(['fecha'])['perdidassuperficiales'].sum().reset_index()
+    contaminante = indice_contaminante.slice(from_year, to_year).groupby(['FECHA', 'AÑO'])['VALOR_MEDIO'].mean().reset_index()
+    bandas_filtradas = bandas[bandas['contaminante'] == nombre_contaminante]
+
+
+    max_valor = contaminante['VALOR_MEDIO'].max()
+    if np.isnan(max_valor):
+        # No daily means in the range: only the first band is shown.
+        max_valor = bandas_filtradas['min'].min()
+    max_band = math.ceil((max_valor + 10) / 10) * 10
+
+    bandas_filtradas = bandas_filtradas[bandas_filtradas['min'] <= max_valor]
+    bandas_filtradas.loc[bandas_filtradas.index[-1], 'max'] = max_band
+    
+    # Fire/no-fire split and box statistics are computed here so that only
+    # one summary row per box (plus a bounded set of outliers) reaches Vega.
+    dias_incendio = data.loc[data['perdidassuperficiales'] > 0, 'fecha']
+    contaminante['Incendio'] = np.where(contaminante['FECHA'].isin(dias_incendio), 'Si', 'No')
+    resumen, atipicos = boxplot_summary(contaminante, 'Incendio', 'VALOR_MEDIO')
+
+    color_incendio = alt.Color('Incendio:N', legend=None, scale=alt.Scale(
+        domain=['No', 'Si'],
+        range=["#668F58","#994E38"]
+    ))
+    x_incendio = alt.X('Incendio:N', title='¿Hubo incendio?')
+
+    bigotes = alt.Chart(resumen).mark_rule().encode(
+        x=x_incendio,
+        y=alt.Y('lower:Q', title='NO2 media'),
+        y2='upper:Q',
+        color=color_incendio
+    )
+
+    cajas = alt.Chart(resumen).mark_bar(size=50).encode(
+        x=x_incendio,
+        y='q1:Q',
+        y2='q3:Q',
+        color=color_incendio,
+        tooltip=[
+            alt.Tooltip('Incendio:N', title='¿Hubo incendio?'),
+            alt.Tooltip('count:Q', title='Días'),
+            alt.Tooltip('upper:Q', title='Máximo', format='.2f'),
+            alt.Tooltip('q3:Q', title='Q3', format='.2f'),
+            alt.Tooltip('median:Q', title='Mediana', format='.2f'),
+            alt.Tooltip('q1:Q', title='Q1', format='.2f'),
+            alt.Tooltip('lower:Q', title='Mínimo', format='.2f')
+        ]
+    )
+
+    medianas = alt.Chart(resumen).mark_tick(size=50, color='white').encode(
+        x=x_incendio,
+        y='median:Q'
+    )
+
+    puntos_atipicos = alt.Chart(atipicos).mark_point().encode(
+        x=x_incendio,
+        y='VALOR_MEDIO:Q',
+        color=color_incendio
+    )
+
+    boxplot = alt.layer(bigotes, cajas, medianas, puntos_atipicos)
+
+    background = alt.Chart(bandas_filtradas).mark_rect(opacity=0.25).encode(
+        y='min:Q',
+        y2='max:Q',
+        color=alt.Color(
+            'label:N',
+            scale=alt.Scale(
+                domain=bandas_filtradas['label'].tolist(),
+                range=bandas_filtradas['color'].tolist()
+            ),
+            title='Rangos ' + format_nombre_contaminante(nombre_contaminante)
+        )
+    )
+
+
+    chart = alt.layer(background, boxplot).resolve_scale(
+        y='shared',
+        color='independent'
+    ).properties(
+        height=390, 
+        padding={"bottom": 30}  
+    ).configure_legend(
+        labelLimit=0    
+    )
+    return chart
+
+
+def plot_fire_NDVI_monthly(cube, ndvi, colores, comunidad): 
+    incendios_agregado = cube.per_month(comunidad)[['mesdeteccion', 'graves']].rename(columns={'graves': 'numero'})
+
+    df = pd.merge(ndvi, incendios_agregado, on="mesdeteccion", how='left')
+
+    chart_incendios = (
+        alt.Chart(df)
+        .mark_line(color=colores[0],point=alt.OverlayMarkDef(filled=False, fill="white"))
+        .transform_calculate(Variable = '"Incendios graves"')
+        .encode(
+            x=alt.X("mesdeteccion:O", sort=MESES, title="Mes"),
+            y=alt.Y("numero:Q", title="Número de incendios graves"),
+            tooltip=[
+                alt.Tooltip("mesdeteccion:O", title="Mes"),
+                alt.Tooltip("numero:Q", title="Incendios graves"),
+                alt.Tooltip("ndvi_mean:Q", title="NDVI")
+            ],
+            color=alt.Color('Variable:N', scale=alt.Scale(range=colores))
+        )
+    )
+
+    chart_ndvi = (
+        alt.Chart(df)
+        .mark_line(color=colores[1], point=alt.OverlayMarkDef(filled=False, fill="white"))
+        .transform_calculate(Variable = '"NDVI"')
+        .encode(
+            x=alt.X("mesdeteccion:O", sort=MESES, title="Mes"),
+            y=alt.Y("ndvi_mean:Q", title="NDVI"), 
+            tooltip=[
+                alt.Tooltip("mesdeteccion:O", title="Mes"),
+                alt.Tooltip("numero:Q", title="Incendios graves"),
+                alt.Tooltip("ndvi_mean:Q", title="NDVI")
+            ],
+            color=alt.Color('Variable:N', scale=alt.Scale(range=colores))
+        )
+    )
+
+    combined_chart = alt.layer(
+        chart_incendios,
+        chart_ndvi, 
+    ).resolve_scale(
+        x='shared',
+        y='independent'
+    ).properties(height=500).configure_legend(
+        titleFontSize=14,
+        labelFontSize=12,
+        orient='bottom'
+    )
+
+    return combined_chart
+
+
+
+def plot_fire_contaminant_monthly(cube, indice_contaminante, nombre_contaminante, colores, from_year, to_year, comunidad):
+    incendios_agregado = cube.per_month(comunidad, from_year, to_year)[['mesdeteccion', 'graves']].rename(columns={'graves': 'numero'})
+
+    contaminante = indice_contaminante.aggregate(from_year, to_year).set_index('mesdeteccion')['mean'] \
+        .rename('VALOR_FINAL').reindex(MESES).rename_axis('mesdeteccion').reset_index()
+    
+    df = pd.merge(contaminante, incendios_agregado, on="mesdeteccion", how='left')
+
+
+    chart_incendios = alt.Chart(df).mark_line( point=alt.OverlayMarkDef(filled=False, fill="white")
+        ).transform_calculate(
+            Variable = '"Incendios graves"'
+        ).encode(
+        x=alt.X('mesdeteccion:O', sort=MESES, title='Mes'),
+        y=alt.Y('numero:Q', title='Número de incendios graves'),
+        tooltip=[
+                alt.Tooltip("mesdeteccion:O", title="Mes"),
+                alt.Tooltip("numero:Q", title="Incendios graves"),
+                alt.Tooltip("VALOR_FINAL:Q", title="NDVI")
+            ],
+            color=alt.Color('Variable:N', scale=alt.Scale(range=colores)) 
+    )
+
+    chart_ndvi = alt.Chart(df).mark_line(point=alt.OverlayMarkDef(filled=False, fill="white")
+        ).transform_calculate(
+            Variable = f'"{nombre_contaminante}"'
+        ).encode(
+        x=alt.X('mesdeteccion:N', sort=MESES, title='Mes'),
+        y=alt.Y('VALOR_FINAL:Q', title=format_nombre_contaminante(nombre_contaminante)),
+        tooltip=[
+                alt.Tooltip("mesdeteccion:O", title="Mes"),
+                alt.Tooltip("numero:Q", title="Incendios graves"),
+                alt.Tooltip("VALOR_FINAL:Q", title="NDVI")
+            ],
+        color=alt.Color('Variable:N', scale=alt.Scale(range=colores))
+    )
+
+
+    combined_chart = alt.layer(
+        chart_incendios,
+        chart_ndvi
+    ).resolve_scale(
+        x='shared',
+        y='independent'
+    ).properties(height=500).configure_legend(
+        titleFontSize=14,
+        labelFontSize=12,
+        orient='bottom'
+    )
+
+
+    return combined_chart
+
+
+def plot_fire_lag_response(incendios, df_contaminante, nombre_contaminante, window, from_year, to_year):
+    fuegos = incendios[(incendios.anio >= from_year) & (incendios.anio <= to_year)]
+    respuesta = response_by_offset(fire_windows(fuegos, df_contaminante, window))
+
+    x_offset = alt.X('offset:Q', title='Días respecto al incendio', scale=alt.Scale(domain=[-window, window]))
+
+    intervalo = alt.Chart(respuesta).mark_area(opacity=0.25, color="#994E38").encode(
+        x=x_offset,
+        y=alt.Y('ic_inf:Q', title=f'{format_nombre_contaminante(nombre_contaminante)} medio', scale=alt.Scale(zero=False)),
+        y2='ic_sup:Q'
+    )
+
+    media = alt.Chart(respuesta).mark_line(color="#994E38", point=alt.OverlayMarkDef(filled=False, fill="white")).encode(
+        x=x_offset,
+        y='media:Q',
+        tooltip=[
+            alt.Tooltip('offset:Q', title='Días'),
+            alt.Tooltip('media:Q', title='Media', format='.2f'),
+            alt.Tooltip('ic_inf:Q', title='IC 95% inferior', format='.2f'),
+            alt.Tooltip('ic_sup:Q', title='IC 95% superior', format='.2f'),
+            alt.Tooltip('incendios:Q', title='Incendios')
+        ]
+    )
+
+    dia_incendio = alt.Chart(pd.DataFrame({'offset': [0]})).mark_rule(strokeDash=[4, 4], color='gray').encode(
+        x='offset:Q'
+    )
+
+    return alt.layer(intervalo, media, dia_incendio).properties(height=400)
+
+
+def etiqueta_estacion(estacion):
+    return 'Provincia {} · Municipio {} · Estación {}'.format(*estacion)
+
+
+def _series_points(dias, valores, width, metodo):
+    if metodo == 'lttb':
+        return lttb(dias, valores, width)
+    # Lowest and highest reading per pair of pixels.
+    return minmax(dias, valores, width // 2)
+
+
+def plot_station_series(incendios, indice_contaminante, nombre_contaminante, estacion, from_year, to_year, width=SERIE_ANCHO, metodo='minmax'):
+    provincia, municipio, numero = estacion
+    df_contaminante = indice_contaminante.slice(from_year, to_year)
+    serie = df_contaminante[
+        (df_contaminante['PROVINCIA'] == provincia) & (df_contaminante['MUNICIPIO'] == municipio)
+        & (df_contaminante['ESTACION'] == numero) & df_contaminante['VALOR_MEDIO'].notna()
+    ].groupby('FECHA')['VALOR_MEDIO'].mean()
+
+    dias = serie.index.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    puntos = _series_points(dias, serie.to_numpy(), width, metodo)
+    serie = serie.iloc[puntos].reset_index()
+
+    # Fires of the station's province, at most the biggest day per bucket.
+    fuegos = incendios[
+        (incendios.idprovincia == provincia) & (incendios.anio >= from_year) & (incendios.anio <= to_year)
+    ].groupby('fecha')['perdidassuperficiales'].sum()
+    if len(dias):
+        fuegos = fuegos[(fuegos.index >= serie['FECHA'].iloc[0]) & (fuegos.index <= serie['FECHA'].iloc[-1])]
+    dias_fuego = fuegos.index.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    fuegos = fuegos.iloc[bucket_argmax(dias_fuego, fuegos.to_numpy(), width // 2)].reset_index()
+
+    x_fecha = alt.X('FECHA:T', title='Fecha')
+    marcas_fuego = alt.Chart(fuegos).mark_rule(color="#994E38").encode(
+        x=alt.X('fecha:T', title='Fecha'),
+        opacity=alt.Opacity('perdidassuperficiales:Q', title='Hectáreas quemadas', scale=alt.Scale(type='log', range=[0.15, 0.8])),
+        tooltip=[
+            alt.Tooltip('fecha:T', title='Fecha'),
+            alt.Tooltip('perdidassuperficiales:Q', title='Hectáreas', format='.1f')
+        ]
+    )
+
+    linea = alt.Chart(serie).mark_line(color="#668F58", strokeWidth=1).encode(
+        x=x_fecha,
+        y=alt.Y('VALOR_MEDIO:Q', title=f'{format_nombre_contaminante(nombre_contaminante)} media diaria'),
+        tooltip=[
+            alt.Tooltip('FECHA:T', title='Fecha'),
+            alt.Tooltip('VALOR_MEDIO:Q', title='Media diaria', format='.2f')
+        ]
+    )
+
+    return alt.layer(marcas_fuego, linea).properties(height=350).configure_legend(orient='bottom')
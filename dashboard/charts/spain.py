@@ -0,0 +1,299 @@
+"""Chart builders for the Spain page (``spain.py``)."""
+
+import altair as alt
+
+from dashboard.rollups import ndvi_previo_stats
+from dashboard.store import MESES
+
+# Width in pixels the map's level of detail is chosen for.
+MAPA_ANCHO = 1000
+
+COLORES_MAPA = {
+    'NDVI_previo': ('NDVI previo', alt.Scale(scheme='yellowgreen')),
+    'perdidassuperficiales': ('Hectáreas quemadas', alt.Scale(type='log', scheme='orangered')),
+}
+
+
+def fires_per_reg_barchart(cube, from_year, to_year, colores):
+    data = cube.per_comunidad(from_year, to_year)[['comunidad', 'total']].sort_values(by='total', ascending=False)
+
+    chart = alt.Chart(data).mark_bar(color=colores[0]).encode(
+        x=alt.X('comunidad:N', sort='-y', title='Comunidad Autónoma', axis=alt.Axis(labelAngle=-90, labelLimit=0)),
+        y=alt.Y('total:Q', title='Número total de incendios'),
+        tooltip=[
+            alt.Tooltip("total", title="Nº incendios")  
+        ]
+    ).properties(
+        height=500
+    )
+    return chart
+
+
+
+
+def fires_per_5year(cube, from_year, to_year, colores): 
+    colores_reversed = colores[::-1]
+    data_grouped = cube.per_period(max(from_year, 1970), min(to_year, 2014), width=5).rename(
+        columns={'periodo': 'rango_5_anios'}
+    ).sort_values(by='rango_5_anios')
+
+
+    base = alt.Chart(data_grouped).encode(
+        x=alt.X('rango_5_anios:O', title='Rango de años')
+    )
+
+    bar = base.mark_bar().transform_calculate(Variable = '"NDVI"').encode(
+        y=alt.Y('count:Q', title='Número de hectáreas quemadas'),
+        color=alt.Color('Variable:N', scale=alt.Scale(range=colores_reversed))
+    )
+
+    line = base.mark_line(strokeWidth=3, point=alt.OverlayMarkDef(filled=False, fill="white")).transform_calculate(Variable = '"Número de incendios"').encode(
+        y=alt.Y('total:Q', title='Número de incendios'),
+        color=alt.Color('Variable:N', scale=alt.Scale(range=colores_reversed))
+    )
+
+    hover = alt.selection_point(
+        fields=["rango_5_anios"], nearest=False, on="pointermove", empty="none"
+    )
+
+    selector = base.mark_rect(opacity=0).encode(
+        opacity=alt.value(0),
+        tooltip=[
+            alt.Tooltip('rango_5_anios:O', title='Rango años'),
+            alt.Tooltip('count:Q', title='Hectáreas quemadas'),
+            alt.Tooltip('total:Q', title='Número de incendios')
+        ]
+    ).add_params(hover)
+
+    chart = alt.layer(bar, line, selector).resolve_scale(
+        y='independent'
+    ).properties(
+        height=500
+    )
+
+    return chart
+
+
+def fires_per_year(cube, from_year, to_year, colores): 
+    data = cube.per_year(from_year, to_year).sort_values(by='total', ascending=False)
+
+    base = alt.Chart(data).encode(
+        x=alt.X('anio:O', title='Año')
+    )
+
+    numero = base.mark_bar(color=colores[0]).encode(
+        y=alt.Y('count:Q', title='Número total de incendios')
+    ).properties(height=250, width=800)
+
+
+    ha = base.mark_bar(color=colores[1],strokeWidth=3).encode(
+        y=alt.Y('total:Q', title='Número de hectáreas quemadas')
+    ).properties(height=250)
+
+    hover = alt.selection_point(
+        fields=["anio"], nearest=False, on="pointermove", empty="none"
+    )
+
+    selector = base.mark_rect(opacity=0).encode(
+        opacity=alt.value(0),
+        tooltip=[
+            alt.Tooltip('anio:O', title='Año'),
+            alt.Tooltip('count:Q', title='Número de incendios'),
+            alt.Tooltip('total:Q', title='Hectáreas quemadas')
+        ]
+    ).add_params(hover)
+
+    points_numero = base.mark_point(color=colores[0]).encode(
+        y=alt.Y('count:Q'),
+        opacity=alt.condition(hover, alt.value(1), alt.value(0))
+    )
+    points_ha = base.mark_point(color= colores[1]).encode(
+        y=alt.Y('total:Q'),
+        opacity=alt.condition(hover, alt.value(1), alt.value(0))
+    )
+    rule = base.mark_rule(color='gray').encode(
+        opacity=alt.condition(hover, alt.value(0.4), alt.value(0))
+    )
+
+
+
+    chart = alt.vconcat(
+        alt.layer(numero, selector, points_numero, rule),
+        alt.layer(ha, selector, points_ha, rule)
+    ).resolve_scale(
+        x='shared',
+        y='independent'
+    )
+    return chart
+
+
+def bubbles(input_df, from_year, to_year):
+    data = input_df[(input_df.anio >= from_year) & (input_df.anio <= to_year)].groupby('comunidad_y', observed=True).agg(
+        total_incendios=('count', 'sum'),
+        total_hectareas=('total', 'sum'),
+        ndvi=('ndvi_mean', 'mean')
+    ).reset_index()
+    data['ndvi_boost'] = data['ndvi'] * 1.1
+    data['incendios_boost'] = data['total_incendios'] * 1.1
+
+    base = alt.Chart(data)
+    bubbles = base.mark_circle(opacity=0.75).encode(
+        x=alt.X('ndvi:Q', title='NVDI'),
+        y=alt.Y('total_incendios:Q', title='Número total de incendios'),
+        size=alt.Size('total_hectareas:Q', title='Hectáreas quemadas', legend=None, scale=alt.Scale(range=[200, 4500])),
+        color=alt.Color('comunidad_y:N', title='Comunidad', scale=alt.Scale(scheme='category20')),
+        tooltip=[
+            alt.Tooltip('comunidad_y:N', title='Comunidad'),
+            alt.Tooltip('total_incendios:Q', title='Total incendios'),
+            alt.Tooltip('total_hectareas:Q', title='Total hectáreas'),
+            alt.Tooltip('ndvi:Q', title='NDVI medio', format='.2f')
+    ]
+    )
+
+    dummies = base.mark_circle(opacity=0).encode(
+        x='ndvi_boost:Q',
+        y='incendios_boost:Q'
+    )
+
+    chart = (bubbles + dummies).properties(
+        height=500,     
+        title=alt.TitleParams(
+            '*Tamaño de las burbujas determinado por el número de hectáreas quedadas',
+            color='darkgray',
+            baseline='bottom',
+            orient='bottom',
+            anchor='end', 
+            fontWeight = 'normal'
+        )
+)
+    return chart    
+
+
+def serious_fires_ndvi(ndvi, cube, colores):
+    colores_reversed = colores[::-1]
+
+    # Twelve rows, one per month: serious fires over all years and mean NDVI.
+    data = cube.per_month()[['mesdeteccion', 'graves']].merge(ndvi, on="mesdeteccion")
+    base = alt.Chart(data)
+
+    selector = alt.selection_point(
+        fields=["mesdeteccion"], 
+        nearest=True, 
+        on="mouseover", 
+        empty="none"
+    )
+
+    chart_incendios = (
+        base
+        .transform_calculate(Variable = '"Número de incendios"')
+        .mark_line(strokeWidth=3,point=alt.OverlayMarkDef(filled=False, fill="white"))
+        .encode(
+            x=alt.X("mesdeteccion:O", sort=MESES, title="Mes"),
+            y=alt.Y("graves:Q", title="Número de incendios graves"), 
+            color=alt.Color('Variable:N', scale=alt.Scale(range=colores_reversed))
+        )
+    )
+
+    chart_ndvi = (
+        base
+        .transform_calculate(Variable = '"NDVI"')
+        .mark_line(strokeWidth=3,point=alt.OverlayMarkDef(filled=False, fill="white"))
+        .encode(
+            x=alt.X("mesdeteccion:O", sort=MESES, title="Mes"),
+            y=alt.Y("NDVI:Q", title="NDVI"),
+            color = alt.Color('Variable:N', scale=alt.Scale(range=colores_reversed))
+        )
+    )
+
+    puntos = (
+        base
+        .mark_circle(size=0, opacity=0) 
+        .encode(
+            x=alt.X("mesdeteccion:O", sort=MESES),
+            tooltip=[
+                alt.Tooltip("mesdeteccion:O", title="Mes"),
+                alt.Tooltip("graves:Q", title="Incendios graves"),
+                alt.Tooltip("NDVI:Q", title="NDVI")
+            ]
+        )
+        .add_params(selector)
+    )
+
+    combined_chart = alt.layer(
+        chart_incendios,
+        chart_ndvi,
+        puntos
+    ).resolve_scale(
+        x="shared",
+        y="independent"
+    ).properties(
+        height=500, 
+        title=alt.TitleParams(
+            '*El filtrado de años no aplica a este gráfico',
+            color='darkgray',
+            baseline='bottom',
+            orient='bottom',
+            anchor='end', 
+            fontWeight = 'normal'
+        )
+    ).configure_legend(
+        titleFontSize=14,
+        labelFontSize=12,
+        orient='bottom'
+    )
+
+
+    return combined_chart
+
+
+
+def previous_ndvi(input_df, from_year, to_year):
+    data = ndvi_previo_stats(input_df, from_year, to_year)
+
+    scatter = alt.Chart(data).mark_circle(size=100).encode(
+        x=alt.X('n_incendios:Q', title='Número de incendios'),
+        y=alt.Y('perdidassuperficiales_sum:Q', title='Hectáreas quemadas'),
+        color=alt.Color('NDVI_previo_mean:Q', title='NDVI medio', scale=alt.Scale(scheme='viridis')),
+        tooltip=[
+            alt.Tooltip('provincia:N', title='Comunidad'),
+            alt.Tooltip('n_incendios:Q', title='Nº incendios'),
+            alt.Tooltip('perdidassuperficiales_sum:Q', title= 'Hectáreas quemadas'),
+            alt.Tooltip('NDVI_previo_mean:Q', title= 'NDVI previo')
+        ]
+    ).properties(height=500)
+
+    return scatter
+
+
+def fire_map(geometrias, viewport, from_year, to_year, color):
+    poligonos, puntos, _ = geometrias.query(viewport, from_year, to_year, width=MAPA_ANCHO)
+    titulo, escala = COLORES_MAPA[color]
+    tooltip = [
+        alt.Tooltip('anio:Q', title='Año'),
+        alt.Tooltip('NDVI_previo:Q', title='NDVI previo', format='.3f'),
+        alt.Tooltip('perdidassuperficiales:Q', title='Hectáreas', format='.1f')
+    ]
+
+    # The viewport's outline fixes the projection to the chosen zone.
+    x0, y0, x1, y1 = viewport
+    marco = alt.Chart(alt.Data(values=[{
+        'type': 'Feature',
+        'geometry': {'type': 'Polygon', 'coordinates': [[[x0, y0], [x0, y1], [x1, y1], [x1, y0], [x0, y0]]]},
+        'properties': {},
+    }])).mark_geoshape(fill=None, stroke='lightgray')
+
+    perimetros = alt.Chart(alt.Data(values=poligonos)).mark_geoshape(strokeWidth=0.5, stroke='#555').transform_calculate(
+        **{campo: f'datum.properties.{campo}' for campo in ('anio', 'NDVI_previo', 'perdidassuperficiales')}
+    ).encode(
+        color=alt.Color(f'{color}:Q', title=titulo, scale=escala),
+        tooltip=tooltip
+    )
+
+    puntos = alt.Chart(puntos).mark_circle(size=15, opacity=0.8).encode(
+        longitude='lon:Q',
+        latitude='lat:Q',
+        color=alt.Color(f'{color}:Q', title=titulo, scale=escala),
+        tooltip=tooltip
+    )
+
+    return alt.layer(marco, perimetros, puntos).project('mercator').properties(height=600).configure_legend(orient='bottom')
@@ -0,0 +1,21 @@
+"""Defaults of the pages' widgets and the columns the pages read.
+
+The pages take their first-run state from here, and so do the snapshot,
+the benchmark and the warm-up, so a chart built outside a page gets the same
+arguments (and spec cache key) as the page's own first run.
+"""
+
+COLORES = ["#CA694B", "#88BB75"]
+
+# Regional page: comunidad (as named in the fire database), pollutant,
+# lag window in days and station series reduction shown first.
+COMUNIDAD = 'Andalucia'
+CONTAMINANTE = 'PM10'
+VENTANA = 7
+METODO = 'minmax'
+
+# Columns read from each dataset.
+COLUMNAS_INCENDIOS_NDVI = ['comunidad_y', 'anio', 'total', 'count', 'ndvi_mean']
+COLUMNAS_NDVI_MENSUAL = ['mesdeteccion', 'NDVI']
+COLUMNAS_ICA = ['anio', 'label', 'Incendio']
+COLUMNAS_CONTAMINANTE = ['AÑO', 'mesdeteccion', 'FECHA', 'PROVINCIA', 'MUNICIPIO', 'ESTACION', 'VALOR_MEDIO', 'VALOR_FINAL']
@@ -0,0 +1,68 @@
+"""Shape preserving downsampling of long series before they reach Vega.
+
+Both methods take ``x`` sorted ascending (numbers, or dates as day numbers)
+and return the positions of the points to keep, so any other column can be
+selected along.
+
+``minmax`` splits the x range into equal buckets, one or two per pixel, and
+keeps the lowest and highest point of each: peaks and dips survive exactly.
+``lttb`` (Largest Triangle Three Buckets) keeps one point per bucket, the one
+forming the largest triangle with its neighbours, which follows the visual
+shape of the line with fewer points.
+"""
+
+import numpy as np
+
+
+def _buckets(x, n_buckets):
+    x = np.asarray(x, dtype=float)
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.zeros(len(x), dtype=np.int64)
+    return np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+
+
+def bucket_argmax(x, y, n_buckets):
+    """Position of the largest ``y`` in each of ``n_buckets`` equal x ranges that has points."""
+    if len(x) == 0:
+        return np.array([], dtype=np.int64)
+    bucket = _buckets(x, n_buckets)
+    order = np.lexsort((-np.asarray(y, dtype=float), bucket))
+    first = np.r_[True, bucket[order][1:] != bucket[order][:-1]]
+    return np.sort(order[first])
+
+
+def minmax(x, y, n_buckets):
+    """Positions of the lowest and highest point of each bucket, plus both ends."""
+    n = len(x)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    keep = np.concatenate([[0, n - 1], bucket_argmax(x, y, n_buckets), bucket_argmax(x, -y, n_buckets)])
+    return np.unique(keep)
+
+
+def lttb(x, y, n_out):
+    """Positions of the ``n_out`` points chosen by Largest Triangle Three Buckets."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # n_out - 2 buckets between the first and the last point, which are kept.
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # The third vertex is the mean of the next bucket (the last point for the last bucket).
+        nxt = slice(hi, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
@@ -0,0 +1,177 @@
+"""Optional DuckDB backend answering the dashboard's aggregations from files.
+
+With ``DASHBOARD_BACKEND=duckdb`` the fire rollups and the NDVI before fire
+statistics are computed by an embedded DuckDB database straight from the
+files instead of from frames held in memory. Only the columns a query uses
+are read and the year range is pushed down into the scan, so the history can
+be far larger than the Streamlit worker's memory.
+
+A dataset is read from, in order of preference:
+
+1. a directory next to the CSV with the same stem (``data/incendios/``)
+   holding Parquet files, optionally hive partitioned (``anio=2015/...``);
+2. the typed Parquet copy kept by ``dashboard.store``, when up to date;
+3. the CSV file itself.
+
+``DASHBOARD_DUCKDB_MEMORY_LIMIT`` (for instance ``2GB``) caps the memory
+DuckDB may use before spilling to disk. Needs the ``duckdb`` package.
+"""
+
+import os
+from pathlib import Path
+
+import streamlit as st
+
+from dashboard.instrumentation import timed
+from dashboard.rollups import SERIOUS_FIRE_HA, FireCube
+from dashboard.store import MESES, parquet_path
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+ENABLED = os.environ.get('DASHBOARD_BACKEND') == 'duckdb'
+
+MEMORY_LIMIT = os.environ.get('DASHBOARD_DUCKDB_MEMORY_LIMIT')
+
+
+@st.cache_resource
+def get_connection():
+    """Process wide in-memory DuckDB database; use a cursor per query."""
+    if duckdb is None:
+        raise ImportError('DASHBOARD_BACKEND=duckdb needs the duckdb package: pip install duckdb')
+    con = duckdb.connect()
+    if MEMORY_LIMIT:
+        con.execute(f"SET memory_limit = '{MEMORY_LIMIT}'")
+    return con
+
+
+def source_of(file_path):
+    """SQL table expression reading ``file_path`` (as ``$path``) and the path to bind."""
+    file_path = Path(file_path)
+    partitions = file_path.with_suffix('')
+    if partitions.is_dir():
+        return 'read_parquet($path, hive_partitioning = true, union_by_name = true)', str(partitions / '**' / '*.parquet')
+
+    copy = parquet_path(file_path)
+    if copy.exists() and copy.stat().st_mtime >= file_path.stat().st_mtime:
+        return 'read_parquet($path)', str(copy)
+    return 'read_csv($path, header = true)', str(file_path)
+
+
+def file_version(file_path):
+    """Size and modification time of ``file_path``, or of its partition directory."""
+    file_path = Path(file_path)
+    partitions = file_path.with_suffix('')
+    stat = os.stat(partitions if partitions.is_dir() else file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DuckDBQueries:
+    """Parameterised queries over one dataset, always read from its current file."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    @property
+    def version(self):
+        return file_version(self.file_path)
+
+    def query(self, name, sql, **params):
+        """Run ``sql`` with named ``$params``; ``{source}`` stands for the dataset."""
+        # Resolved on every query: a stale Parquet copy falls back to the CSV.
+        source, path = source_of(self.file_path)
+
+        with timed('query', name) as fields:
+            with get_connection().cursor() as cursor:
+                df = cursor.execute(sql.format(source=source), {**params, 'path': path}).df()
+            fields['rows_out'] = len(df)
+        return df
+
+
+class DuckDBFires(DuckDBQueries):
+    """Same queries as ``FireCube``, answered by DuckDB from the fire file."""
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        years = self.query('fires.years', 'SELECT min(anio) AS first, max(anio) AS last FROM {source}')
+        self.first_year = int(years['first'].iloc[0])
+        self.last_year = int(years['last'].iloc[0])
+
+    def totals(self, from_year, to_year):
+        """Number of fires and burned hectares in the range."""
+        data = self.query('fires.totals', '''
+            SELECT count(*) AS total, coalesce(sum(perdidassuperficiales), 0) AS hectareas
+            FROM {source}
+            WHERE anio BETWEEN $from_year AND $to_year AND comunidad IS NOT NULL
+        ''', from_year=from_year, to_year=to_year)
+        return int(data['total'].iloc[0]), float(data['hectareas'].iloc[0])
+
+    def per_comunidad(self, from_year, to_year):
+        """One row per comunidad with fires in the range: number of fires and burned hectares."""
+        return self.query('fires.per_comunidad', '''
+            SELECT comunidad, count(*) AS total, coalesce(sum(perdidassuperficiales), 0) AS hectareas
+            FROM {source}
+            WHERE anio BETWEEN $from_year AND $to_year AND comunidad IS NOT NULL
+            GROUP BY comunidad
+            ORDER BY comunidad
+        ''', from_year=from_year, to_year=to_year)
+
+    def per_year(self, from_year, to_year):
+        """One row per year with fires: burned hectares (``total``) and number of fires (``count``)."""
+        return self.query('fires.per_year', '''
+            SELECT anio, coalesce(sum(perdidassuperficiales), 0) AS total, count(*) AS count
+            FROM {source}
+            WHERE anio BETWEEN $from_year AND $to_year AND comunidad IS NOT NULL
+            GROUP BY anio
+            ORDER BY anio
+        ''', from_year=from_year, to_year=to_year)
+
+    def per_period(self, from_year, to_year, width=5):
+        """Per year figures summed into ``width``-year periods, as ``FireCube.per_period``."""
+        return FireCube.per_period(self, from_year, to_year, width)
+
+    def per_month(self, comunidad=None, from_year=None, to_year=None):
+        """One row per month (``mesdeteccion``) with fires, serious fires and hectares."""
+        data = self.query('fires.per_month', '''
+            SELECT
+                mesdeteccion,
+                count(*) AS count,
+                count(*) FILTER (WHERE perdidassuperficiales > $serious) AS graves,
+                coalesce(sum(perdidassuperficiales), 0) AS hectareas
+            FROM {source}
+            WHERE anio BETWEEN $from_year AND $to_year
+              AND comunidad IS NOT NULL
+              AND ($comunidad IS NULL OR comunidad = $comunidad)
+            GROUP BY mesdeteccion
+        ''',
+            serious=SERIOUS_FIRE_HA,
+            from_year=self.first_year if from_year is None else from_year,
+            to_year=self.last_year if to_year is None else to_year,
+            comunidad=comunidad,
+        )
+        return data.set_index('mesdeteccion').reindex(MESES, fill_value=0).rename_axis('mesdeteccion').reset_index()
+
+
+class DuckDBNdviPrevio(DuckDBQueries):
+    """NDVI before fire statistics answered by DuckDB from the file."""
+
+    def stats(self, from_year, to_year):
+        """Same result as ``rollups.ndvi_previo_stats`` on the whole file."""
+        return self.query('ndvi_previo.stats', '''
+            SELECT
+                fortnight,
+                anio,
+                provincia,
+                avg(NDVI_previo) AS NDVI_previo_mean,
+                coalesce(sum(perdidassuperficiales), 0) AS perdidassuperficiales_sum,
+                avg(perdidassuperficiales) AS perdidassuperficiales_mean,
+                max(perdidassuperficiales) AS perdidassuperficiales_max,
+                count(geometry) AS n_incendios
+            FROM {source}
+            WHERE anio BETWEEN $from_year AND $to_year
+              AND fortnight IS NOT NULL AND provincia IS NOT NULL
+            GROUP BY fortnight, anio, provincia
+            ORDER BY fortnight, anio, provincia
+        ''', from_year=from_year, to_year=to_year)
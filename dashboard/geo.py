@@ -0,0 +1,430 @@
+"""Fire geometries of ``NDVI_previo_incendios.csv`` for the map view.
+
+The WKT of the ``geometry`` column (points, polygons and multipolygons) is
+converted once into a compact binary file next to the Parquet copies,
+``data/.geo/NDVI_previo_incendios.npz``:
+
+* coordinates are integers in units of ``PRECISION`` degrees, stored as
+  the first vertex of each ring plus small deltas within it, which take
+  one or two bytes and compress well;
+* a level equal to the next finer one is only stored once;
+* each level of detail of ``LEVELS`` is the geometry snapped to a grid of
+  that many degrees, with repeated vertices removed; rings that collapse to
+  fewer than three vertices are dropped, and a fire left without polygons is
+  drawn as a point at its centre;
+* a uniform grid over the bounding boxes of the fires indexes them, so a
+  viewport query only tests the fires of the cells it covers.
+
+``FireGeometries.query`` returns the fires visible in a viewport and year
+range, at the coarsest level that moves no vertex by more than a pixel:
+
+    python -m dashboard.geo --data data
+
+rebuilds the file unless it is newer than the CSV.
+"""
+
+import argparse
+import os
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dashboard.store import read_dataset
+
+# Grid steps, in degrees, of the simplified levels from the coarsest; the
+# last level is the full geometry.
+LEVELS = (0.04, 0.01, 0.0025, 0.0005)
+
+# Degrees per stored coordinate unit (about one metre).
+PRECISION = 1e-5
+
+# Cells per side of the spatial index.
+GRID = 64
+
+GEO_DIRNAME = '.geo'
+
+# Fires drawn at most in one view, the largest first, and polygon vertices
+# sent at most (a coarser level is used past it).
+MAX_FEATURES = 3000
+MAX_VERTICES = 25_000
+
+COLUMNS = ['anio', 'provincia', 'NDVI_previo', 'perdidassuperficiales', 'geometry']
+
+_TOKENS = re.compile(r'[()]|[^()]+')
+
+
+def geo_path(file_path):
+    file_path = Path(file_path)
+    return file_path.parent / GEO_DIRNAME / f'{file_path.stem}.npz'
+
+
+def _offsets(counts):
+    return np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+
+
+def _smallest(values):
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(dtype)
+    return values
+
+
+def parse_wkt(geometries):
+    """Flat arrays of the WKT in ``geometries``.
+
+    Returns the vertices (float, one row per vertex, closing vertices
+    removed), the offsets of rings into vertices, of polygons into rings and
+    of fires into polygons, and the centre of each fire: the point itself,
+    or the centre of the polygons' bounding box. Missing or empty
+    geometries have no polygons and a NaN centre.
+    """
+    vertices, ring_sizes, polygon_sizes, feature_sizes, centres = [], [], [], [], []
+    for wkt in geometries:
+        kind, _, body = wkt.partition('(') if isinstance(wkt, str) else ('', '', '')
+        kind = kind.strip().upper()
+        if kind == 'POINT':
+            centres.append(np.array(body.strip(' )').split()[:2], dtype=float))
+            feature_sizes.append(0)
+            continue
+        if kind not in ('POLYGON', 'MULTIPOLYGON'):
+            centres.append(np.full(2, np.nan))
+            feature_sizes.append(0)
+            continue
+
+        # The body starts inside the first parenthesis.
+        ring_depth = 3 if kind == 'MULTIPOLYGON' else 2
+        depth, polygons, rings = 1, 0, []
+        for token in _TOKENS.findall(body):
+            if token == '(':
+                depth += 1
+                if depth == ring_depth - 1:
+                    polygons += 1
+                    polygon_sizes.append(0)
+            elif token == ')':
+                depth -= 1
+            elif depth == ring_depth:
+                ring = np.array(token.replace(',', ' ').split(), dtype=float).reshape(-1, 2)
+                if len(ring) > 1 and (ring[0] == ring[-1]).all():
+                    ring = ring[:-1]
+                if kind == 'POLYGON' and polygons == 0:
+                    polygons = 1
+                    polygon_sizes.append(0)
+                rings.append(ring)
+                ring_sizes.append(len(ring))
+                polygon_sizes[-1] += 1
+        vertices.extend(rings)
+        feature_sizes.append(polygons)
+        if rings:
+            allv = np.concatenate(rings)
+            centres.append((allv.min(axis=0) + allv.max(axis=0)) / 2)
+        else:
+            centres.append(np.full(2, np.nan))
+
+    return (
+        np.concatenate(vertices) if vertices else np.empty((0, 2)),
+        _offsets(ring_sizes),
+        _offsets(polygon_sizes),
+        _offsets(feature_sizes),
+        np.array(centres).reshape(-1, 2),
+    )
+
+
+def simplify(vertices, rings, polygons, features, step):
+    """Snap ``vertices`` (integer units) to a grid of ``step`` units and drop what collapses.
+
+    Offsets follow ``parse_wkt``; returns the same four arrays for the
+    simplified geometry. A polygon goes when its outer ring does.
+    """
+    snapped = np.round(vertices / step).astype(np.int64) * step
+    n_rings = len(rings) - 1
+    ring_of = np.repeat(np.arange(n_rings), np.diff(rings))
+
+    first = np.zeros(len(snapped), dtype=bool)
+    first[rings[:-1][np.diff(rings) > 0]] = True
+    keep = first.copy()
+    keep[1:] |= (snapped[1:] != snapped[:-1]).any(axis=1)
+
+    # A ring's last vertex can land back on its first one.
+    counts = np.bincount(ring_of[keep], minlength=n_rings)
+    kept = np.flatnonzero(keep)
+    ends = _offsets(counts)
+    closing = (counts > 1)
+    last, start = kept[ends[1:][closing] - 1], kept[ends[:-1][closing]]
+    wraps = (snapped[last] == snapped[start]).all(axis=1)
+    keep[last[wraps]] = False
+    counts = np.bincount(ring_of[keep], minlength=n_rings)
+
+    polygon_of = np.repeat(np.arange(len(polygons) - 1), np.diff(polygons))
+    valid_polygon = np.zeros(len(polygons) - 1, dtype=bool)
+    outer = polygons[:-1][np.diff(polygons) > 0]
+    valid_polygon[np.flatnonzero(np.diff(polygons) > 0)] = counts[outer] >= 3
+    valid_ring = (counts >= 3) & valid_polygon[polygon_of]
+
+    keep &= valid_ring[ring_of]
+    feature_of = np.repeat(np.arange(len(features) - 1), np.diff(features))
+    return (
+        snapped[keep],
+        _offsets(counts[valid_ring]),
+        _offsets(np.bincount(polygon_of[valid_ring], minlength=len(polygons) - 1)[valid_polygon]),
+        _offsets(np.bincount(feature_of[valid_polygon], minlength=len(features) - 1)),
+    )
+
+
+def spatial_index(bboxes, extent, grid=GRID):
+    """Cells of a ``grid`` x ``grid`` split of ``extent``: CSR offsets and the fires in each."""
+    x0, y0, x1, y1 = extent
+    size = np.array([max(x1 - x0, 1), max(y1 - y0, 1)]) / grid
+    lo = np.clip(((bboxes[:, :2] - [x0, y0]) // size).astype(np.int64), 0, grid - 1)
+    hi = np.clip(((bboxes[:, 2:] - [x0, y0]) // size).astype(np.int64), 0, grid - 1)
+
+    fires = np.flatnonzero(bboxes[:, 0] <= bboxes[:, 2])
+    nx = hi[fires, 0] - lo[fires, 0] + 1
+    n = nx * (hi[fires, 1] - lo[fires, 1] + 1)
+    # One entry per (fire, cell) pair, numbered within its fire.
+    k = np.arange(n.sum()) - np.repeat(_offsets(n)[:-1], n)
+    nx, fires = np.repeat(nx, n), np.repeat(fires, n)
+    cells = (lo[fires, 1] + k // nx) * grid + lo[fires, 0] + k % nx
+    order = np.argsort(cells, kind='stable')
+    return _offsets(np.bincount(cells, minlength=grid * grid)), fires[order].astype(np.int32)
+
+
+def build(file_path, out=None, force=False):
+    """Write the binary geometries of ``file_path``; False if they were up to date."""
+    file_path = Path(file_path)
+    out = Path(out) if out else geo_path(file_path)
+    if not force and out.exists() and out.stat().st_mtime >= file_path.stat().st_mtime:
+        return False
+
+    df = read_dataset(file_path, COLUMNS)
+    vertices, rings, polygons, features, centres = parse_wkt(df['geometry'])
+    vertices = np.round(vertices / PRECISION).astype(np.int64)
+    centres = np.round(centres / PRECISION)
+
+    # Bounding box of every fire (its point if it has no polygons).
+    bboxes = np.column_stack([centres, centres])
+    # The vertices of a fire are contiguous, those of the next one follow.
+    first_vertex = rings[polygons[features]]
+    shaped = np.flatnonzero(np.diff(first_vertex) > 0)
+    if len(shaped):
+        bboxes[shaped, :2] = np.minimum.reduceat(vertices, first_vertex[shaped], axis=0)
+        bboxes[shaped, 2:] = np.maximum.reduceat(vertices, first_vertex[shaped], axis=0)
+    located = ~np.isnan(bboxes).any(axis=1)
+    bboxes = np.where(located[:, None], np.nan_to_num(bboxes), [1, 1, 0, 0]).astype(np.int64)
+    extent = np.concatenate([bboxes[located, :2].min(axis=0), bboxes[located, 2:].max(axis=0)]) \
+        if located.any() else np.zeros(4, dtype=np.int64)
+    cell_start, cell_fires = spatial_index(bboxes, extent)
+
+    provincia = pd.Categorical(df['provincia'])
+    arrays = {
+        'anio': df['anio'].to_numpy(dtype=np.int16),
+        'provincia': provincia.codes.astype(np.int16),
+        'provincias': np.array(provincia.categories, dtype=str),
+        'NDVI_previo': df['NDVI_previo'].to_numpy(dtype=np.float32),
+        'perdidassuperficiales': df['perdidassuperficiales'].to_numpy(dtype=np.float32),
+        'centres': np.nan_to_num(centres).astype(np.int32),
+        'bboxes': bboxes.astype(np.int32),
+        'extent': extent.astype(np.int64),
+        'cell_start': cell_start,
+        'cell_fires': cell_fires,
+    }
+    # From the finest level; a level equal to the finer one is stored once.
+    steps = [round(level / PRECISION) for level in LEVELS] + [1]
+    stored = np.arange(len(steps))
+    previous = None
+    for level in reversed(range(len(steps))):
+        geometry = (vertices, rings, polygons, features) if steps[level] == 1 \
+            else simplify(vertices, rings, polygons, features, steps[level])
+        if previous is not None and all(np.array_equal(a, b) for a, b in zip(geometry, previous)):
+            stored[level] = stored[level + 1]
+            continue
+        previous = geometry
+        v, r, p, f = geometry
+        # Deltas within each ring; the rings' first vertices are kept apart.
+        deltas = np.diff(v, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+        starts = r[:-1][np.diff(r) > 0]
+        deltas[starts] = 0
+        arrays.update({
+            f'starts{level}': v[starts].astype(np.int32),
+            f'vertices{level}': _smallest(deltas),
+            f'rings{level}': r,
+            f'polygons{level}': p,
+            f'features{level}': f,
+        })
+    arrays['stored'] = stored
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(f'.{os.getpid()}.tmp.npz')
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, out)
+    return True
+
+
+def _pixel(viewport, width):
+    return max(viewport[2] - viewport[0], viewport[3] - viewport[1]) / width
+
+
+class FireGeometries:
+    """Fires of a binary geometry file, queried by viewport, years and zoom."""
+
+    def __init__(self, path, version=None):
+        with np.load(path) as data:
+            self._data = {name: data[name] for name in data.files}
+        self.version = version
+        self.anio = self._data['anio']
+        self.provincia = self._data['provincia']
+        self.provincias = self._data['provincias']
+        self.NDVI_previo = self._data['NDVI_previo']
+        self.perdidassuperficiales = self._data['perdidassuperficiales']
+        self.centres = self._data['centres']
+        self.bboxes = self._data['bboxes']
+        self.extent = self._data['extent']
+        self.cell_start = self._data['cell_start']
+        self.cell_fires = self._data['cell_fires']
+        # Vertices are decoded once per level, when first asked for.
+        self._vertices = {}
+
+    @property
+    def bounds(self):
+        """Extent of all the fires, in degrees (lon0, lat0, lon1, lat1)."""
+        return tuple(float(v) for v in self.extent * PRECISION)
+
+    def viewport(self, provincia=None, margin=0.05):
+        """Extent in degrees of the fires of ``provincia`` (all if None), widened by ``margin``."""
+        code = np.flatnonzero(self.provincias == provincia)
+        boxes = self.bboxes[(self.provincia == code[0]) & (self.bboxes[:, 0] <= self.bboxes[:, 2])] if len(code) else []
+        if len(boxes) == 0:
+            x0, y0, x1, y1 = self.bounds
+        else:
+            x0, y0 = boxes[:, :2].min(axis=0) * PRECISION
+            x1, y1 = boxes[:, 2:].max(axis=0) * PRECISION
+        pad = margin * max(x1 - x0, y1 - y0, 0.01)
+        return tuple(round(float(v), 5) for v in (x0 - pad, y0 - pad, x1 + pad, y1 + pad))
+
+    def level_for(self, viewport, width):
+        """Coarsest level that moves no vertex by more than a pixel of a ``width`` wide view."""
+        pixel = _pixel(viewport, width)
+        for level, step in enumerate(LEVELS):
+            # Snapping moves a vertex by at most half a step.
+            if step / 2 <= pixel:
+                return level
+        return len(LEVELS)
+
+    def _vertices_of(self, level):
+        level = int(self._data['stored'][level])
+        if level not in self._vertices:
+            rings = self._data[f'rings{level}']
+            sizes = np.diff(rings)
+            total = np.cumsum(self._data[f'vertices{level}'], axis=0, dtype=np.int64)
+            # Shift each ring so that it starts at its stored first vertex.
+            shift = self._data[f'starts{level}'] - total[rings[:-1][sizes > 0]]
+            self._vertices[level] = total + np.repeat(shift, sizes[sizes > 0], axis=0)
+        return self._vertices[level]
+
+    def visible(self, viewport, from_year, to_year):
+        """Positions of the fires whose bounding box meets ``viewport`` in the year range."""
+        x0, y0, x1, y1 = (np.array(viewport) / PRECISION)
+        ex0, ey0, ex1, ey1 = self.extent
+        size = np.array([max(ex1 - ex0, 1), max(ey1 - ey0, 1)]) / GRID
+        cx0, cy0 = np.clip(((np.array([x0, y0]) - [ex0, ey0]) // size).astype(int), 0, GRID - 1)
+        cx1, cy1 = np.clip(((np.array([x1, y1]) - [ex0, ey0]) // size).astype(int), 0, GRID - 1)
+
+        cells = (np.arange(cy0, cy1 + 1)[:, None] * GRID + np.arange(cx0, cx1 + 1)).ravel()
+        starts, ends = self.cell_start[cells], self.cell_start[cells + 1]
+        candidates = np.unique(np.concatenate([self.cell_fires[s:e] for s, e in zip(starts, ends)] or [[]]).astype(np.int64))
+
+        box = self.bboxes[candidates]
+        anio = self.anio[candidates]
+        inside = (box[:, 0] <= x1) & (box[:, 2] >= x0) & (box[:, 1] <= y1) & (box[:, 3] >= y0) \
+            & (anio >= from_year) & (anio <= to_year)
+        return candidates[inside]
+
+    def query(self, viewport, from_year, to_year, width=1000, limit=MAX_FEATURES):
+        """Fires visible in ``viewport`` (degrees) at the level for ``width`` pixels.
+
+        Returns the GeoJSON features of the fires drawn as polygons and a
+        frame of the ones drawn as points (lon, lat): fires without polygons
+        at that level or smaller than two pixels. Both have ``anio``,
+        ``NDVI_previo`` and ``perdidassuperficiales``, the largest ``limit``
+        fires in all, and the level used.
+        """
+        fires = self.visible(viewport, from_year, to_year)
+        fires = fires[np.argsort(-self.perdidassuperficiales[fires], kind='stable')[:limit]]
+
+        # Fires smaller than two pixels are drawn as points.
+        box = self.bboxes[fires]
+        size = np.maximum(box[:, 2] - box[:, 0], box[:, 3] - box[:, 1]) * PRECISION
+        large = size >= 2 * _pixel(viewport, width)
+
+        # Coarser levels while the polygons would go over the vertex budget.
+        level = self.level_for(viewport, width)
+        while True:
+            stored = int(self._data['stored'][level])
+            rings, polygons, features = (self._data[f'{name}{stored}'] for name in ('rings', 'polygons', 'features'))
+            shaped = (features[fires + 1] > features[fires]) & large
+            first_vertex = rings[polygons[features]]
+            if level == 0 or (first_vertex[fires + 1] - first_vertex[fires])[shaped].sum() <= MAX_VERTICES:
+                break
+            level -= 1
+        vertices = self._vertices_of(level)
+
+        poligonos = []
+        for fire in fires[shaped]:
+            coordinates = []
+            for polygon in range(features[fire], features[fire + 1]):
+                coordinates.append([
+                    np.round(np.vstack([ring, ring[:1]]) * PRECISION, 5).tolist()
+                    for ring in (vertices[rings[r]:rings[r + 1]] for r in range(polygons[polygon], polygons[polygon + 1]))
+                ])
+            poligonos.append({
+                'type': 'Feature',
+                'geometry': {'type': 'MultiPolygon', 'coordinates': coordinates},
+                'properties': self._properties(fire),
+            })
+
+        points = fires[~shaped]
+        puntos = pd.DataFrame({
+            'lon': self.centres[points, 0] * PRECISION,
+            'lat': self.centres[points, 1] * PRECISION,
+            'anio': self.anio[points],
+            'NDVI_previo': self.NDVI_previo[points],
+            'perdidassuperficiales': self.perdidassuperficiales[points],
+        })
+        return poligonos, puntos, level
+
+    def _properties(self, fire):
+        ndvi = float(self.NDVI_previo[fire])
+        return {
+            'anio': int(self.anio[fire]),
+            'NDVI_previo': None if np.isnan(ndvi) else round(ndvi, 4),
+            'perdidassuperficiales': round(float(self.perdidassuperficiales[fire]), 2),
+        }
+
+
+@st.cache_resource(max_entries=2)
+def _fire_geometries(file_path, version):
+    build(file_path)
+    return FireGeometries(geo_path(file_path), version)
+
+
+def get_fire_geometries(file_path):
+    """Binary geometries of ``file_path``, built when missing or older than the file."""
+    stat = os.stat(file_path)
+    return _fire_geometries(str(file_path), (stat.st_size, stat.st_mtime_ns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='data', help='directory with NDVI_previo_incendios.csv (default: data)')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the file is up to date')
+    args = parser.parse_args(argv)
+    if not build(Path(args.data) / 'NDVI_previo_incendios.csv', force=args.force):
+        print('the fire geometries are up to date', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
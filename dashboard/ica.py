@@ -0,0 +1,144 @@
+"""Daily air quality index (ICA) computed from the pollutant series.
+
+Every daily ``VALOR_FINAL`` is classified into the bands of its pollutant in
+``bandas_contaminantes.csv`` (lower bound included, upper bound excluded;
+values past the last band fall in it). A station's level for a day is its
+worst band over all pollutants, and the day's level is the worst over all
+stations. Fire days from ``dias_incendio_andalucia.csv`` are then joined to
+give the table the pies read, ``df_ica_diario.csv``:
+
+    python -m dashboard.ica --data data
+
+rewrites it unless it is newer than every input. Every series in
+``POLLUTANT_FILES`` is needed, as a day's level is its worst over all of
+them; with ``--partial`` the table is built from the series that exist and
+the ones left out are reported.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dashboard.pollutants import POLLUTANT_FILES
+from dashboard.store import read_dataset
+
+# A station is identified by its municipality and its number within it.
+STATION = ['PROVINCIA', 'MUNICIPIO', 'ESTACION']
+
+
+def band_levels(bandas):
+    """Band labels from the best to the worst, checked to agree across pollutants."""
+    orders = {
+        contaminante: tuple(group.sort_values('min')['label'])
+        for contaminante, group in bandas.groupby('contaminante', observed=True)
+    }
+    niveles = set(orders.values())
+    if len(niveles) != 1:
+        raise ValueError(f'Pollutants disagree on the order of their bands: {orders}')
+    return list(niveles.pop())
+
+
+def classify(values, bandas_contaminante):
+    """Band index (0 is the best) of each value; -1 for missing or below the first band."""
+    edges = np.sort(bandas_contaminante['min'].to_numpy(dtype=float))
+    values = np.asarray(values, dtype=float)
+    level = np.searchsorted(edges, values, side='right') - 1
+    level[np.isnan(values)] = -1
+    return level.astype(np.int8)
+
+
+def station_levels(series, bandas):
+    """Worst band per (FECHA, station) over the pollutants in ``series``.
+
+    ``series`` maps a pollutant name, as in ``bandas.contaminante``, to its
+    daily frame with FECHA, the ``STATION`` columns and VALOR_FINAL.
+    """
+    parts = []
+    for nombre, df in series.items():
+        nivel = classify(df['VALOR_FINAL'], bandas[bandas['contaminante'] == nombre])
+        part = df[['FECHA', *STATION]].assign(nivel=nivel)
+        parts.append(part[nivel >= 0])
+
+    if not parts:
+        return pd.DataFrame(columns=['FECHA', *STATION, 'nivel'])
+    return pd.concat(parts, ignore_index=True).groupby(['FECHA', *STATION], sort=True)['nivel'].max().reset_index()
+
+
+def ica_diario(series, bandas, dias_incendio):
+    """One row per day with a classified reading, as in ``df_ica_diario.csv``.
+
+    ``label`` is the worst band of the day over every station and pollutant;
+    ``perdidassuperficiales`` adds the hectares of the day's fires and
+    ``Incendio`` tells whether there was any.
+    """
+    niveles = band_levels(bandas)
+    diario = station_levels(series, bandas).groupby('FECHA')['nivel'].max()
+
+    hectareas = dias_incendio.groupby('fecha')['perdidassuperficiales'].sum()
+    hectareas = hectareas.reindex(diario.index)
+    incendio = hectareas.notna().to_numpy()
+
+    return pd.DataFrame({
+        'FECHA': diario.index,
+        'label': pd.Categorical.from_codes(diario.to_numpy(), categories=niveles, ordered=True),
+        'anio': diario.index.year.astype('int16'),
+        'fecha': diario.index.where(incendio),
+        'perdidassuperficiales': hectareas.fillna(0).to_numpy(),
+        'Incendio': pd.Categorical(np.where(incendio, 'Si', 'No'), categories=['No', 'Si']),
+    })
+
+
+def build(data_dir='data', out=None, force=False, partial=False):
+    """Write ``df_ica_diario.csv`` from the files in ``data_dir``; False if it was up to date.
+
+    Raises FileNotFoundError, leaving ``out`` alone, when a pollutant series
+    is missing, unless ``partial`` allows building from the others.
+    """
+    data_dir = Path(data_dir)
+    out = Path(out) if out else data_dir / 'df_ica_diario.csv'
+
+    pollutants = {nombre: data_dir / Path(path).name for nombre, path in POLLUTANT_FILES.items()}
+    missing = [nombre for nombre, path in pollutants.items() if not path.exists()]
+    if missing and (not partial or len(missing) == len(pollutants)):
+        raise FileNotFoundError(
+            f'Missing pollutant series in {data_dir}: {", ".join(missing)}'
+            + ('' if partial else '; use --partial to build the index from the others')
+        )
+    for nombre in missing:
+        del pollutants[nombre]
+    inputs = [data_dir / 'bandas_contaminantes.csv', data_dir / 'dias_incendio_andalucia.csv', *pollutants.values()]
+    if not force and out.exists() and out.stat().st_mtime >= max(p.stat().st_mtime for p in inputs):
+        return False
+
+    series = {nombre: read_dataset(path, ['FECHA', *STATION, 'VALOR_FINAL']) for nombre, path in pollutants.items()}
+    ica = ica_diario(
+        series,
+        read_dataset(data_dir / 'bandas_contaminantes.csv'),
+        read_dataset(data_dir / 'dias_incendio_andalucia.csv', ['fecha', 'perdidassuperficiales']),
+    )
+
+    tmp = out.with_suffix(f'.{os.getpid()}.tmp')
+    ica.to_csv(tmp, date_format='%Y-%m-%d')
+    tmp.replace(out)
+    if missing:
+        print(f'{out.name} built from {", ".join(pollutants)} only, without {", ".join(missing)}', file=sys.stderr)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='data', help='directory with the input files (default: data)')
+    parser.add_argument('--out', help='output file (default: DATA/df_ica_diario.csv)')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the output is up to date')
+    parser.add_argument('--partial', action='store_true', help='build from the pollutant series that exist')
+    args = parser.parse_args(argv)
+    if not build(args.data, args.out, args.force, args.partial):
+        print('df_ica_diario.csv is up to date', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Latency and payload instrumentation of the dashboard's hot paths.
+
+Data loads, chart builds and chart renders are timed and recorded with the
+number of rows going in and out and the size of the serialized spec. Each
+record is kept in a bounded in-process buffer (for the debug panel) and
+written as one JSON line to the ``dashboard.metrics`` logger.
+
+Environment variables:
+
+``DASHBOARD_METRICS_LOG``
+    File to append the JSON lines to (``-`` for stderr). Unset, records only
+    reach whatever handlers the application configured.
+``DASHBOARD_LATENCY_BUDGET_MS``
+    A build or render slower than this logs a warning (default: 1000).
+``DASHBOARD_DEBUG``
+    Set to ``1`` to always show the debug panel; otherwise it is opt-in per
+    session with the ``?debug=1`` query parameter.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+LATENCY_BUDGET_MS = float(os.environ.get('DASHBOARD_LATENCY_BUDGET_MS', 1000))
+
+# Records kept per (kind, name) for the percentiles.
+HISTORY = 500
+
+logger = logging.getLogger('dashboard.metrics')
+
+_log_target = os.environ.get('DASHBOARD_METRICS_LOG')
+if _log_target:
+    _handler = logging.StreamHandler(sys.stderr) if _log_target == '-' else logging.FileHandler(_log_target)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+class Metrics:
+    """Thread safe, bounded history of timing records."""
+
+    def __init__(self, history=HISTORY):
+        self._records = defaultdict(lambda: deque(maxlen=history))
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self._records[record['kind'], record['name']].append(record)
+
+    def summary(self):
+        """One row per (kind, name) with count and p50/p95/max latency in ms."""
+        with self._lock:
+            groups = {key: list(records) for key, records in self._records.items()}
+
+        rows = []
+        for (kind, name), records in sorted(groups.items()):
+            ms = np.array([r['ms'] for r in records])
+            sizes = [r['bytes'] for r in records if r.get('bytes') is not None]
+            rows.append({
+                'kind': kind,
+                'name': name,
+                'count': len(records),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'max_ms': float(ms.max()),
+                'last_bytes': sizes[-1] if sizes else None,
+            })
+        return pd.DataFrame(rows, columns=['kind', 'name', 'count', 'p50_ms', 'p95_ms', 'max_ms', 'last_bytes'])
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+metrics = Metrics()
+
+
+def record(kind, name, seconds, **fields):
+    """Store and log one measurement; warn when it is over the latency budget."""
+    entry = {'ts': time.time(), 'kind': kind, 'name': name, 'ms': round(seconds * 1000, 3), **fields}
+    metrics.add(entry)
+    logger.info(json.dumps(entry, default=str))
+    if kind != 'load' and entry['ms'] > LATENCY_BUDGET_MS:
+        logger.warning('%s %s took %.0f ms (budget %.0f ms)', kind, name, entry['ms'], LATENCY_BUDGET_MS)
+
+
+@contextmanager
+def timed(kind, name, **fields):
+    """Time the block and record it; the yielded dict can be filled with extra fields."""
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(kind, name, time.perf_counter() - start, **fields)
+
+
+def count_rows(*objects):
+    """Total rows of the DataFrames among ``objects``."""
+    return sum(len(obj) for obj in objects if isinstance(obj, pd.DataFrame))
+
+
+def debug_enabled():
+    return os.environ.get('DASHBOARD_DEBUG') == '1' or st.query_params.get('debug') == '1'
+
+
+def debug_panel():
+    """Per chart latency percentiles, drawn only when debugging is enabled."""
+    if not debug_enabled():
+        return
+
+    with st.expander("Rendimiento (debug)"):
+        summary = metrics.summary()
+        if summary.empty:
+            st.caption("Sin medidas todavía.")
+            return
+        lentos = summary[(summary['kind'] != 'load') & (summary['p95_ms'] > LATENCY_BUDGET_MS)]
+        if not lentos.empty:
+            st.warning("Por encima del presupuesto: " + ", ".join(sorted(set(lentos['name']))))
+        st.dataframe(summary, hide_index=True, width="stretch")
+        st.caption(f"Presupuesto de latencia: {LATENCY_BUDGET_MS:.0f} ms")
@@ -0,0 +1,94 @@
+"""Pollutant levels in windows of days around each fire.
+
+Every fire of ``dias_incendio_andalucia.csv`` is matched with the stations of
+its province (``idprovincia`` against the series' ``PROVINCIA``) and, for
+each day offset in ``-window..window``, with the station readings of that
+day. The lookup is a single sorted join: readings are keyed by
+``station * span + day`` and sorted once, and the keys of every (fire,
+station, offset) triple are found with ``np.searchsorted``, so the cost
+grows with the number of triples rather than fires times readings.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dashboard.ica import STATION
+
+
+def _days(dates):
+    return dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def fire_windows(fires, series, window=7):
+    """Mean reading of the fire's province stations at each day offset around each fire.
+
+    ``fires`` has ``fecha`` and ``idprovincia``; ``series`` has FECHA, the
+    ``STATION`` columns and VALOR_FINAL. Returns one row per fire (its
+    position in ``fires``) and offset with data: ``valor`` and the number of
+    ``estaciones`` that contributed.
+    """
+    columns = ['incendio', 'offset', 'valor', 'estaciones']
+    readings = series[series['VALOR_FINAL'].notna()]
+    position = np.flatnonzero(fires['fecha'].notna())
+    fires = fires.iloc[position]
+    if readings.empty or fires.empty:
+        return pd.DataFrame(columns=columns)
+
+    station = readings.groupby(STATION, sort=False, observed=True).ngroup().to_numpy()
+    day = _days(readings['FECHA'])
+    first_day = day.min()
+    # Padding both ends by the window keeps every looked up day inside its
+    # station's key range.
+    span = int(day.max() - first_day) + 1 + 2 * window
+    keys = station * span + (day - first_day + window)
+
+    # One value per station and day, sorted by key.
+    keys, inverse = np.unique(keys, return_inverse=True)
+    values = np.bincount(inverse, weights=readings['VALOR_FINAL'].to_numpy()) / np.bincount(inverse)
+
+    provincias = pd.DataFrame({
+        'station': station,
+        'PROVINCIA': readings['PROVINCIA'].to_numpy(),
+    }).drop_duplicates('station')
+    pairs = pd.DataFrame({
+        'incendio': position,
+        'PROVINCIA': fires['idprovincia'].to_numpy(),
+        'day': _days(fires['fecha']),
+    }).merge(provincias, on='PROVINCIA')
+
+    offsets = np.arange(-window, window + 1)
+    rel = pairs['day'].to_numpy()[:, None] - first_day + window + offsets
+    inside = (rel >= 0) & (rel < span)
+    query = pairs['station'].to_numpy()[:, None] * span + rel
+
+    pos = np.searchsorted(keys, query[inside])
+    found = pos < len(keys)
+    found[found] = keys[pos[found]] == query[inside][found]
+
+    incendio = np.broadcast_to(pairs['incendio'].to_numpy()[:, None], rel.shape)[inside][found]
+    offset = np.broadcast_to(offsets, rel.shape)[inside][found]
+    valor = values[pos[found]]
+
+    # Average over the stations of the province, per fire and offset.
+    cell = incendio * len(offsets) + (offset + window)
+    cells, inverse = np.unique(cell, return_inverse=True)
+    estaciones = np.bincount(inverse)
+    return pd.DataFrame({
+        'incendio': cells // len(offsets),
+        'offset': cells % len(offsets) - window,
+        'valor': np.bincount(inverse, weights=valor) / estaciones,
+        'estaciones': estaciones,
+    })
+
+
+def response_by_offset(windows):
+    """Mean reading over fires at each offset, with a 95% confidence interval."""
+    stats = windows.groupby('offset')['valor'].agg(['mean', 'std', 'count'])
+    margen = 1.96 * stats['std'].fillna(0) / np.sqrt(stats['count'])
+    return pd.DataFrame({
+        'offset': stats.index,
+        'media': stats['mean'].to_numpy(),
+        'ic_inf': (stats['mean'] - margen).to_numpy(),
+        'ic_sup': (stats['mean'] + margen).to_numpy(),
+        'incendios': stats['count'].to_numpy(),
+    })
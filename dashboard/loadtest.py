@@ -0,0 +1,315 @@
+"""Load test of one Streamlit worker with concurrent headless sessions.
+
+Starts ``streamlit run streamlit_app.py`` on a local port (or uses a running
+server with ``--url``) and connects ``--sessions`` clients that behave like
+browsers: each opens one of the pages and keeps changing its filters at
+random (the year slider ranges, the pollutant and the "Rangos de 5 años" /
+"Anual" buttons), now and then moving to the other page, and waits for
+every rerun to finish before thinking about the next one.
+
+    python -m dashboard.loadtest --sessions 20 --duration 60 --json load.json
+    python -m dashboard.loadtest --url ws://localhost:8501 --pid 1234 --sessions 50
+
+It reports the p50/p95/p99 rerun latency per page and action, the reruns per
+second and the server's resident memory sampled every ``--interval``
+seconds. The clients speak Streamlit's websocket protocol
+(``/_stcore/stream``) with the ``websockets`` package, as the browser does,
+so the reruns go through the same sessions, fragments and caches.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP = 'streamlit_app.py'
+PAGES = ['spain', 'comunidad']
+
+# Widgets driven by the sessions, by label.
+POLLUTANT = 'Contaminante'
+VIEW_BUTTONS = ('Rangos de 5 años', 'Anual')
+
+# Relative weight of each action when it is available on the page.
+ACTIONS = {'years': 4, 'pollutant': 2, 'view': 2, 'page': 1}
+
+WIDGETS = ('slider', 'selectbox', 'radio', 'button')
+
+
+def _websockets():
+    try:
+        import websockets
+    except ImportError:
+        sys.exit('the load test needs the websockets package: pip install websockets')
+    return websockets
+
+
+def rss(pid):
+    """Resident memory of process ``pid`` in bytes, or None if unknown."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    try:
+        if psutil is not None:
+            return psutil.Process(pid).memory_info().rss
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class Session:
+    """One browser tab: the widgets of its page and the values it set."""
+
+    def __init__(self, ws, rng):
+        self.ws = ws
+        self.rng = rng
+        self.page = None
+        self.widgets = {}
+        self.values = {}
+
+    async def rerun(self, fragment_id='', trigger=None):
+        """Send the widget values and wait for the script to finish; returns an error or None."""
+        message = BackMsg()
+        state = message.rerun_script
+        state.query_string = ''
+        state.page_name = self.page
+        state.fragment_id = fragment_id
+        ids = {proto.id for _, proto, _ in self.widgets.values()}
+        state.widget_states.widgets.extend(v for widget_id, v in self.values.items() if widget_id in ids)
+        if trigger is not None:
+            state.widget_states.widgets.append(WidgetState(id=trigger, trigger_value=True))
+
+        await self.ws.send(message.SerializeToString())
+        error = None
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await self.ws.recv())
+            kind = msg.WhichOneof('type')
+            if kind == 'script_finished':
+                return error
+            if kind != 'delta' or msg.delta.WhichOneof('type') != 'new_element':
+                continue
+            element = msg.delta.new_element
+            element_type = element.WhichOneof('type')
+            if element_type == 'exception':
+                error = error or element.exception.message
+            elif element_type in WIDGETS:
+                proto = getattr(element, element_type)
+                self.widgets[proto.label] = (element_type, proto, msg.delta.fragment_id)
+
+    def actions(self):
+        available = ['page']
+        if self._year_slider():
+            available.append('years')
+        if POLLUTANT in self.widgets:
+            available.append('pollutant')
+        if any(label in self.widgets for label in VIEW_BUTTONS):
+            available.append('view')
+        return available
+
+    def _year_slider(self):
+        return next((label for label, (kind, proto, _) in self.widgets.items()
+                     if kind == 'slider' and len(proto.default) == 2 and not proto.disabled), None)
+
+    async def open(self, page):
+        self.page = page
+        self.widgets.clear()
+        self.values.clear()
+        return await self.rerun()
+
+    async def act(self, action):
+        """Do ``action`` with random values; returns an error or None."""
+        if action == 'page':
+            return await self.open(self.rng.choice([p for p in PAGES if p != self.page]))
+        if action == 'view':
+            _, proto, fragment_id = self.widgets[self.rng.choice([b for b in VIEW_BUTTONS if b in self.widgets])]
+            return await self.rerun(fragment_id, trigger=proto.id)
+        if action == 'years':
+            _, proto, fragment_id = self.widgets[self._year_slider()]
+            lo, hi = sorted(self.rng.randint(int(proto.min), int(proto.max)) for _ in range(2))
+            value = WidgetState(id=proto.id)
+            value.double_array_value.data.extend([lo, hi])
+        else:
+            _, proto, fragment_id = self.widgets[POLLUTANT]
+            value = WidgetState(id=proto.id, string_value=self.rng.choice(list(proto.options)))
+        self.values[proto.id] = value
+        return await self.rerun(fragment_id)
+
+
+async def _session(number, url, origin, deadline, think, rng, results):
+    websockets = _websockets()
+    async with websockets.connect(f'{url}/_stcore/stream', max_size=None) as ws:
+        session = Session(ws, rng)
+        action = 'open'
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if action == 'open':
+                error = await session.open(rng.choice(PAGES))
+            else:
+                error = await session.act(action)
+            results.append({
+                'session': number,
+                'page': session.page,
+                'action': action,
+                'start': start - origin,
+                'seconds': time.perf_counter() - start,
+                'error': error,
+            })
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+            choices = session.actions()
+            action = rng.choices(choices, [ACTIONS[a] for a in choices])[0]
+
+
+async def _sample_rss(pid, interval, samples, stop):
+    start = time.perf_counter()
+    while not stop.is_set():
+        samples.append((time.perf_counter() - start, rss(pid)))
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _drive(url, sessions, duration, think, ramp, pid, interval, seed):
+    results, samples = [], []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(pid, interval, samples, stop)) if pid else None
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def delayed(number):
+        await asyncio.sleep(ramp * number / max(sessions, 1))
+        await _session(number, url, start, deadline, think, random.Random(seed * 1000 + number), results)
+
+    await asyncio.gather(*(delayed(n) for n in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    if sampler is not None:
+        await sampler
+    return results, samples, elapsed
+
+
+def summary(results):
+    """Latency percentiles per (page, action) and over all reruns."""
+    groups = defaultdict(list)
+    for r in results:
+        groups[r['page'], r['action']].append(r)
+        groups['*', '*'].append(r)
+    rows = []
+    # The overall row goes last.
+    for (page, action), runs in sorted(groups.items(), key=lambda item: (item[0] == ('*', '*'), item[0])):
+        ms = np.array([r['seconds'] for r in runs]) * 1000
+        rows.append({
+            'page': page,
+            'action': action,
+            'reruns': len(runs),
+            'errors': sum(r['error'] is not None for r in runs),
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99)),
+        })
+    return rows
+
+
+def start_server(app, port):
+    """``streamlit run`` of ``app`` on ``port``, once it answers its health check."""
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', app, '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            sys.exit(f'streamlit exited with code {server.returncode}')
+        try:
+            with urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit('streamlit did not start in 60 s')
+
+
+def run(url=None, sessions=10, duration=60, think=1.0, ramp=5.0, pid=None, interval=1.0,
+        seed=0, app=APP, port=8599, out=sys.stdout):
+    """Drive ``sessions`` clients for ``duration`` seconds; returns the report as a dict."""
+    server = None
+    if url is None:
+        server = start_server(app, port)
+        url, pid = f'ws://localhost:{port}', server.pid
+    try:
+        results, samples, elapsed = asyncio.run(
+            _drive(url, sessions, duration, think, ramp, pid, interval, seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    rows = summary(results)
+    for row in rows:
+        print(
+            f"{row['page']:10} {row['action']:10} {row['reruns']:7d} reruns {row['errors']:4d} errors "
+            f"p50 {row['p50_ms']:8.1f} ms  p95 {row['p95_ms']:8.1f} ms  p99 {row['p99_ms']:8.1f} ms",
+            file=out,
+        )
+    print(f"{len(results) / elapsed:.2f} reruns/s with {sessions} sessions over {elapsed:.1f} s", file=out)
+    memory = [b for _, b in samples if b is not None]
+    if memory:
+        print(f"RSS {memory[0] / 2**20:.0f} MiB at start, {max(memory) / 2**20:.0f} MiB peak, "
+              f"{memory[-1] / 2**20:.0f} MiB at end", file=out)
+    for r in results:
+        if r['error'] is not None:
+            print(f"ERROR {r['page']} {r['action']}: {r['error']}", file=sys.stderr)
+
+    return {
+        'sessions': sessions,
+        'seconds': elapsed,
+        'throughput': len(results) / elapsed,
+        'summary': rows,
+        'rss': [{'seconds': t, 'bytes': b} for t, b in samples],
+        'reruns': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10, help='concurrent sessions (default: 10)')
+    parser.add_argument('--duration', type=float, default=60, help='seconds of load (default: 60)')
+    parser.add_argument('--think', type=float, default=1.0,
+                        help='mean seconds between the reruns of a session (default: 1)')
+    parser.add_argument('--ramp', type=float, default=5.0, help='seconds over which sessions connect (default: 5)')
+    parser.add_argument('--url', help='websocket URL of a running server, e.g. ws://localhost:8501')
+    parser.add_argument('--pid', type=int, help='process to sample RSS from with --url')
+    parser.add_argument('--port', type=int, default=8599, help='port of the server started without --url')
+    parser.add_argument('--app', default=APP, help=f'Streamlit entry point (default: {APP})')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between RSS samples (default: 1)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the report, with every rerun and RSS sample, to this file')
+    args = parser.parse_args(argv)
+
+    report = run(args.url, args.sessions, args.duration, args.think, args.ramp, args.pid,
+                 args.interval, args.seed, args.app, args.port)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(row['errors'] for row in report['summary']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
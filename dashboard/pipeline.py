@@ -0,0 +1,375 @@
+"""Build the derived files in ``data/`` from the raw fire and NDVI inputs.
+
+Inputs, relative to the data directory:
+
+``incendios.csv``
+    The fire database, also read by the app.
+``raw/ndvi_comunidades.csv``
+    Monthly mean NDVI per comunidad: ``comunidad`` (official name, as in
+    ``COMUNIDADES_NDVI``), ``anio``, ``mes`` and ``ndvi``.
+``raw/ndvi_incendios.csv``
+    NDVI before each fire and its location: ``id`` (as in the fire
+    database), ``NDVI_previo`` and ``geometry`` (WKT).
+
+plus the pollutant series and ``bandas_contaminantes.csv`` for the ICA table.
+
+Each stage declares its inputs and outputs; a stage reruns only when the
+digest of its inputs' contents and of its code differs from the one
+recorded after its last successful run (in ``.pipeline.json``). Stages whose
+inputs are ready run in parallel processes.
+
+    python -m dashboard.pipeline --data data --jobs 4
+    python -m dashboard.pipeline merged_data --force
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dashboard import geo, ica, regions
+from dashboard.pollutants import POLLUTANT_FILES
+from dashboard.store import MESES, read_dataset
+
+STATE_FILE = '.pipeline.json'
+
+# First year of the daily air quality and NDVI series.
+FIRST_DAILY_YEAR = 2001
+
+# Official names used by the NDVI source, by idcomunidad of the fire database.
+COMUNIDADES_NDVI = {
+    1: 'País Vasco/Euskadi',
+    2: 'Cataluña/Catalunya',
+    3: 'Galicia',
+    4: 'Andalucía',
+    5: 'Principado de Asturias',
+    6: 'Cantabria',
+    7: 'La Rioja',
+    8: 'Región de Murcia',
+    9: 'Comunitat Valenciana',
+    10: 'Aragón',
+    11: 'Castilla-La Mancha',
+    13: 'Comunidad Foral de Navarra',
+    14: 'Extremadura',
+    15: 'Illes Balears',
+    16: 'Comunidad de Madrid',
+    17: 'Castilla y León',
+}
+ANDALUCIA = 'Andalucia'
+ANDALUCIA_NDVI = 'Andalucía'
+
+
+def _write_csv(df, path):
+    path = Path(path)
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    df.to_csv(tmp, date_format='%Y-%m-%d')
+    os.replace(tmp, path)
+
+
+def _read_csv(path, columns=None):
+    # Raw inputs have no declared schema and are read once per build, so
+    # they skip the Parquet store.
+    return pd.read_csv(path, usecols=columns)
+
+
+def build_dias_incendio(data_dir):
+    """Fires in Andalucía since ``FIRST_DAILY_YEAR``, one row per fire."""
+    fires = read_dataset(data_dir / 'incendios.csv', ['comunidad', 'fecha', 'idprovincia', 'idmunicipio', 'perdidassuperficiales'])
+    fires = fires[(fires['comunidad'] == ANDALUCIA) & (fires['fecha'].dt.year >= FIRST_DAILY_YEAR)]
+    _write_csv(
+        fires[['fecha', 'idprovincia', 'idmunicipio', 'perdidassuperficiales']].reset_index(drop=True),
+        data_dir / 'dias_incendio_andalucia.csv',
+    )
+
+
+def build_merged_data(data_dir):
+    """Burned hectares and number of fires per comunidad and year, with the year's mean NDVI."""
+    fires = read_dataset(data_dir / 'incendios.csv', ['idcomunidad', 'comunidad', 'anio', 'perdidassuperficiales'])
+    per_year = (
+        fires.groupby(['idcomunidad', 'comunidad', 'anio'], observed=True)['perdidassuperficiales']
+        .agg(total='sum', count='count')
+        .reset_index()
+        .rename(columns={'comunidad': 'comunidad_x'})
+    )
+
+    ndvi = _read_csv(data_dir / 'raw' / 'ndvi_comunidades.csv', ['comunidad', 'anio', 'ndvi'])
+    ndvi = ndvi.groupby(['comunidad', 'anio'])['ndvi'].mean().reset_index(name='ndvi_mean')
+    ids = pd.Series({nombre: id_ for id_, nombre in COMUNIDADES_NDVI.items()})
+    ndvi['idcomunidad'] = ndvi['comunidad'].map(ids)
+    ndvi = ndvi.dropna(subset=['idcomunidad']).astype({'idcomunidad': 'int64'}).rename(columns={'comunidad': 'comunidad_y'})
+
+    merged = per_year.astype({'idcomunidad': 'int64', 'anio': 'int64'}).merge(ndvi, on=['idcomunidad', 'anio'])
+    _write_csv(
+        merged[['idcomunidad', 'comunidad_x', 'anio', 'total', 'count', 'comunidad_y', 'ndvi_mean']],
+        data_dir / 'merged_data.csv',
+    )
+
+
+def build_ndvi_mensual(data_dir):
+    """Mean NDVI per month for Spain and for Andalucía."""
+    ndvi = _read_csv(data_dir / 'raw' / 'ndvi_comunidades.csv', ['comunidad', 'mes', 'ndvi'])
+
+    espana = ndvi.groupby('mes')['ndvi'].mean().reindex(range(1, 13))
+    mes = np.array(MESES)[espana.index - 1]
+    _write_csv(
+        pd.DataFrame({'month': espana.index, 'NDVI': espana.to_numpy(), 'Mes': mes, 'mesdeteccion': mes}),
+        data_dir / 'NDVI_mensual.csv',
+    )
+
+    andalucia = ndvi[ndvi['comunidad'] == ANDALUCIA_NDVI].groupby('mes')['ndvi'].mean().reindex(range(1, 13))
+    _write_csv(
+        pd.DataFrame({'mes': andalucia.index, 'ndvi_mean': andalucia.to_numpy(), 'mesdeteccion': mes}),
+        data_dir / 'NDVI_andalucia_mensual.csv',
+    )
+
+
+def build_ndvi_previo(data_dir):
+    """NDVI before each fire in Andalucía with its fortnight of the year, province and burned area."""
+    fires = read_dataset(data_dir / 'incendios.csv', ['id', 'comunidad', 'provincia', 'fecha', 'perdidassuperficiales'])
+    fires = fires[(fires['comunidad'] == ANDALUCIA) & (fires['fecha'].dt.year >= FIRST_DAILY_YEAR)]
+    ndvi = _read_csv(data_dir / 'raw' / 'ndvi_incendios.csv', ['id', 'NDVI_previo', 'geometry'])
+
+    data = fires.merge(ndvi, on='id')
+    fecha = data['fecha'].dt
+    _write_csv(
+        pd.DataFrame({
+            'fortnight': (fecha.month - 1) * 2 + (fecha.day > 15) + 1,
+            'anio': fecha.year,
+            'provincia': data['provincia'],
+            'NDVI_previo': data['NDVI_previo'],
+            'perdidassuperficiales': data['perdidassuperficiales'],
+            'geometry': data['geometry'],
+        }),
+        data_dir / 'NDVI_previo_incendios.csv',
+    )
+
+
+def build_regiones(data_dir):
+    """Fires and monthly NDVI partitioned by comunidad and year (see ``dashboard.regions``)."""
+    fires = read_dataset(data_dir / 'incendios.csv', ['idcomunidad', 'comunidad', 'anio', *regions.DATASETS['incendios']])
+    fires = fires.dropna(subset=['idcomunidad', 'anio'])
+
+    ndvi = _read_csv(data_dir / 'raw' / 'ndvi_comunidades.csv', ['comunidad', 'anio', 'mes', 'ndvi'])
+    ids = pd.Series({nombre: id_ for id_, nombre in COMUNIDADES_NDVI.items()})
+    ndvi['idcomunidad'] = ndvi['comunidad'].map(ids)
+    ndvi = ndvi.dropna(subset=['idcomunidad'])
+
+    # Provinces with air quality stations, from any pollutant series.
+    estaciones = set()
+    for path in POLLUTANT_FILES.values():
+        if (data_dir / Path(path).name).exists():
+            estaciones.update(read_dataset(data_dir / Path(path).name, ['PROVINCIA'])['PROVINCIA'].dropna().astype(int))
+
+    index = []
+    for (idcomunidad, comunidad), region in fires.groupby(['idcomunidad', 'comunidad'], observed=True, sort=True):
+        provincias = sorted(int(p) for p in region['idprovincia'].dropna().unique())
+        index.append({
+            'idcomunidad': int(idcomunidad),
+            'comunidad': str(comunidad),
+            'nombre': COMUNIDADES_NDVI.get(int(idcomunidad), str(comunidad)),
+            'provincias': provincias,
+            'anios': [int(region['anio'].min()), int(region['anio'].max())],
+            'calidad_aire': bool(estaciones.intersection(provincias)),
+        })
+    regions.write_regions(data_dir, fires, ndvi, index)
+
+
+def build_ica_diario(data_dir):
+    """Daily air quality index with the fire days (see ``dashboard.ica``)."""
+    ica.build(data_dir, force=True)
+
+
+def build_geometrias(data_dir):
+    """Simplified fire geometries and their spatial index (see ``dashboard.geo``)."""
+    geo.build(data_dir / 'NDVI_previo_incendios.csv', force=True)
+
+
+class Stage:
+    """A step writing ``outputs`` from ``inputs``, paths relative to the data directory.
+
+    ``code`` lists the modules, besides the one defining ``run``, whose
+    changes must rerun the stage.
+    """
+
+    def __init__(self, name, inputs, outputs, run, code=()):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.run = run
+        self.code = list(code)
+
+    def code_digest(self):
+        # Whole modules: a change in a helper the step calls counts too.
+        digest = hashlib.sha256()
+        for obj in [self.run, *self.code]:
+            digest.update(Path(inspect.getsourcefile(obj)).read_bytes())
+        return digest.hexdigest()
+
+
+def stages(data_dir):
+    """The pipeline's stages.
+
+    The regional partitions use the pollutant series that exist; the ICA
+    table needs every one of them.
+    """
+    all_pollutants = [Path(path).name for path in POLLUTANT_FILES.values()]
+    pollutants = [name for name in all_pollutants if (data_dir / name).exists()]
+    return [
+        Stage('dias_incendio_andalucia', ['incendios.csv'], ['dias_incendio_andalucia.csv'], build_dias_incendio),
+        Stage('merged_data', ['incendios.csv', 'raw/ndvi_comunidades.csv'], ['merged_data.csv'], build_merged_data),
+        Stage('ndvi_mensual', ['raw/ndvi_comunidades.csv'], ['NDVI_mensual.csv', 'NDVI_andalucia_mensual.csv'], build_ndvi_mensual),
+        Stage('ndvi_previo_incendios', ['incendios.csv', 'raw/ndvi_incendios.csv'], ['NDVI_previo_incendios.csv'], build_ndvi_previo),
+        Stage(
+            'geometrias',
+            ['NDVI_previo_incendios.csv'],
+            [f'{geo.GEO_DIRNAME}/NDVI_previo_incendios.npz'],
+            build_geometrias,
+            code=[geo],
+        ),
+        Stage(
+            'regiones',
+            ['incendios.csv', 'raw/ndvi_comunidades.csv', *pollutants],
+            [f'{regions.REGIONS_DIRNAME}/{regions.INDEX_FILE}'],
+            build_regiones,
+            code=[regions],
+        ),
+        Stage(
+            'df_ica_diario',
+            ['bandas_contaminantes.csv', 'dias_incendio_andalucia.csv', *all_pollutants],
+            ['df_ica_diario.csv'],
+            build_ica_diario,
+            code=[ica],
+        ),
+    ]
+
+
+class State:
+    """Digests recorded after each successful stage, plus a cache of file digests."""
+
+    def __init__(self, data_dir, name=STATE_FILE):
+        self.path = Path(data_dir) / name
+        try:
+            state = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            state = {}
+        self.stages = state.get('stages', {})
+        self.files = state.get('files', {})
+
+    def file_digest(self, path):
+        """SHA-256 of the file, recomputed only when its size or mtime changed."""
+        stat = path.stat()
+        cached = self.files.get(str(path))
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.files[str(path)] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def stage_digest(self, stage, data_dir):
+        digest = hashlib.sha256(stage.name.encode())
+        digest.update(stage.code_digest().encode())
+        for name in stage.inputs:
+            digest.update(name.encode())
+            digest.update(self.file_digest(data_dir / name).encode())
+        return digest.hexdigest()
+
+    def save(self):
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'stages': self.stages, 'files': self.files}, indent=1))
+        os.replace(tmp, self.path)
+
+
+def _selected(all_stages, targets, upstream):
+    if not targets:
+        return all_stages
+    unknown = set(targets) - {stage.name for stage in all_stages}
+    if unknown:
+        raise ValueError(f'Unknown stages: {", ".join(sorted(unknown))}')
+
+    wanted = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(upstream[name])
+    return [stage for stage in all_stages if stage.name in wanted]
+
+
+def run(data_dir='data', targets=None, jobs=None, force=False, dry_run=False, out=sys.stdout):
+    """Bring the ``targets`` stages (default: all) and their upstream stages up to date.
+
+    Returns the names of the stages that ran (or would run, with ``dry_run``).
+    """
+    data_dir = Path(data_dir)
+    all_stages = stages(data_dir)
+    producers = {output: stage.name for stage in all_stages for output in stage.outputs}
+    upstream = {stage.name: {producers[i] for i in stage.inputs if i in producers} for stage in all_stages}
+    pending = {stage.name: stage for stage in _selected(all_stages, targets, upstream)}
+
+    state = State(data_dir)
+    ran, running = [], {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            active = set(pending) | {stage.name for stage, _ in running.values()}
+            ready = [name for name in pending if not upstream[name] & active]
+            if not ready and not running:
+                raise RuntimeError(f'Stages depend on each other: {", ".join(pending)}')
+            for name in ready:
+                stage = pending.pop(name)
+                missing = [i for i in stage.inputs if not (data_dir / i).exists() and i not in producers]
+                if missing:
+                    raise FileNotFoundError(f'Stage {name} needs {", ".join(missing)} in {data_dir}')
+
+                # In a dry run, stages below one that would run are stale too.
+                stale_upstream = dry_run and upstream[name] & set(ran)
+                digest = None if stale_upstream else state.stage_digest(stage, data_dir)
+                outputs_exist = all((data_dir / o).exists() for o in stage.outputs)
+                if not force and not stale_upstream and outputs_exist and state.stages.get(name) == digest:
+                    print(f'{name:25} up to date', file=out)
+                elif dry_run:
+                    print(f'{name:25} would run', file=out)
+                    ran.append(name)
+                else:
+                    print(f'{name:25} running', file=out)
+                    running[pool.submit(stage.run, data_dir)] = (stage, digest)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, digest = running.pop(future)
+                future.result()
+                state.stages[stage.name] = digest
+                state.save()
+                ran.append(stage.name)
+                print(f'{stage.name:25} done', file=out)
+
+    state.save()
+    return ran
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('stages', nargs='*', help='stages to build, with their upstream stages (default: all)')
+    parser.add_argument('--data', default='data', help='data directory (default: data)')
+    parser.add_argument('--jobs', type=int, help='parallel processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='rerun the stages even if up to date')
+    parser.add_argument('--dry-run', action='store_true', help='only print which stages would run')
+    args = parser.parse_args(argv)
+    run(args.data, args.stages, args.jobs, args.force, args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
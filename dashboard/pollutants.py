@@ -0,0 +1,46 @@
+"""Lazy registry of the pollutant series."""
+
+from collections.abc import Mapping
+
+from dashboard.store import get_data_from_csv
+from dashboard.timeindex import get_year_index
+
+POLLUTANT_FILES = {
+    'O3': 'data/o3.csv',
+    'SO2': 'data/so2.csv',
+    'NO2': 'data/no2.csv',
+    'PM25': 'data/pm25.csv',
+    'PM10': 'data/pm10.csv',
+}
+
+
+class PollutantRegistry(Mapping):
+    """Mapping from pollutant name to its daily series, loaded on first access.
+
+    Only ``columns`` are read from each file, and a series is never loaded
+    unless it is looked up, so adding pollutants to ``POLLUTANT_FILES`` costs
+    nothing until somebody views them.
+    """
+
+    def __init__(self, columns=None, files=POLLUTANT_FILES):
+        self._files = dict(files)
+        self._columns = list(columns) if columns else None
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            self._loaded[name] = get_data_from_csv(self._files[name], self._columns)
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def index(self, name):
+        """Year index (``AÑO``) of the series, with monthly sums of ``VALOR_FINAL``."""
+        return get_year_index(self._files[name], 'AÑO', self._columns, by=['mesdeteccion'], value='VALOR_FINAL')
@@ -0,0 +1,164 @@
+"""Per comunidad datasets, partitioned on disk by region and year.
+
+The ``regiones`` pipeline stage splits the fire database and the monthly
+NDVI by comunidad and year:
+
+    data/regiones/index.json
+    data/regiones/incendios/idcomunidad=4/anio=2005.parquet
+    data/regiones/ndvi/idcomunidad=4/anio=2005.parquet
+
+``index.json`` lists the comunidades with their name in the fire database,
+their display name, provinces, years, whether the air quality series have
+stations in them and a digest of their rows. Opening a region only reads its
+own files; the year of a row is the one of its file.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from dashboard.rollups import FireCube
+from dashboard.store import MESES, ReadOnlyFrame
+
+REGIONS_DIRNAME = 'regiones'
+INDEX_FILE = 'index.json'
+
+# Dataset -> columns stored in each partition (besides the partition keys).
+DATASETS = {
+    'incendios': ['fecha', 'mesdeteccion', 'idprovincia', 'idmunicipio', 'perdidassuperficiales'],
+    'ndvi': ['mes', 'ndvi'],
+}
+
+
+def partition_path(root, dataset, idcomunidad, anio):
+    return Path(root) / dataset / f'idcomunidad={idcomunidad}' / f'anio={anio}.parquet'
+
+
+def write_partitions(frame, root, dataset, digests):
+    """Write ``frame`` (with ``idcomunidad`` and ``anio``) as one file per region and year.
+
+    The rows of each region are hashed into ``digests[idcomunidad]``.
+    """
+    for (idcomunidad, anio), part in frame.groupby(['idcomunidad', 'anio'], observed=True, sort=True):
+        part = part[DATASETS[dataset]].reset_index(drop=True)
+        path = partition_path(root, dataset, int(idcomunidad), int(anio))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part.to_parquet(path, index=False)
+        digest = digests.setdefault(int(idcomunidad), hashlib.sha1())
+        digest.update(f'{dataset}/{anio}'.encode())
+        digest.update(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+
+
+def write_regions(data_dir, fires, ndvi, regions):
+    """Replace ``data_dir/regiones`` with the partitions of ``fires`` and ``ndvi`` and the index of ``regions``.
+
+    The new tree is written next to the old one and swapped in at the end,
+    with ``index.json`` written last, so readers never see half of it.
+    """
+    root = Path(data_dir) / REGIONS_DIRNAME
+    tmp = root.with_name(f'{REGIONS_DIRNAME}.{os.getpid()}.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    digests = {}
+    write_partitions(fires, tmp, 'incendios', digests)
+    write_partitions(ndvi, tmp, 'ndvi', digests)
+    for region in regions:
+        region['digest'] = digests[region['idcomunidad']].hexdigest()
+    (tmp / INDEX_FILE).write_text(json.dumps({'comunidades': regions}, indent=1, ensure_ascii=False), encoding='utf-8')
+
+    old = root.with_name(f'{REGIONS_DIRNAME}.{os.getpid()}.old')
+    if root.exists():
+        root.rename(old)
+    tmp.rename(root)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def read_partitions(root, dataset, idcomunidad, from_year=None, to_year=None, columns=None):
+    """Rows of ``dataset`` for one region, optionally limited to a year range, with ``anio``."""
+    columns = list(columns or DATASETS[dataset])
+    parts = []
+    for path in sorted(Path(root, dataset, f'idcomunidad={idcomunidad}').glob('anio=*.parquet')):
+        anio = int(path.stem.split('=')[1])
+        if (from_year is None or anio >= from_year) and (to_year is None or anio <= to_year):
+            parts.append(pd.read_parquet(path, columns=columns).assign(anio=anio))
+    if not parts:
+        return pd.DataFrame({col: [] for col in [*columns, 'anio']})
+    return pd.concat(parts, ignore_index=True)
+
+
+def read_index(data_dir):
+    """The comunidades of ``data_dir/regiones``, by ``idcomunidad``."""
+    index = json.loads((Path(data_dir) / REGIONS_DIRNAME / INDEX_FILE).read_text(encoding='utf-8'))
+    return {region['idcomunidad']: region for region in index['comunidades']}
+
+
+class Region:
+    """Fires and NDVI of one comunidad, read from its partitions.
+
+    ``incendios`` has one row per fire (``fecha``, ``anio``, ``mesdeteccion``,
+    ``idprovincia``, ``idmunicipio`` and ``perdidassuperficiales``),
+    ``ndvi_mensual`` the mean NDVI of each month over every year and ``cube``
+    is the fire cube of the region alone. Their version is the digest of the
+    region's rows, so charts stay cached across rebuilds that left it as is.
+    """
+
+    def __init__(self, root, info):
+        self.idcomunidad = info['idcomunidad']
+        self.version = (self.idcomunidad, info.get('digest'))
+        self.comunidad = info['comunidad']
+        self.nombre = info['nombre']
+        self.provincias = info['provincias']
+        self.calidad_aire = info['calidad_aire']
+
+        incendios = read_partitions(root, 'incendios', self.idcomunidad)
+        incendios['mesdeteccion'] = pd.Categorical(incendios['mesdeteccion'], categories=MESES)
+        self.incendios = self._shared(incendios)
+
+        ndvi = read_partitions(root, 'ndvi', self.idcomunidad, columns=['mes', 'ndvi'])
+        mensual = ndvi.groupby('mes')['ndvi'].mean().reindex(range(1, len(MESES) + 1))
+        self.ndvi_mensual = self._shared(pd.DataFrame({
+            'mes': mensual.index,
+            'ndvi_mean': mensual.to_numpy(),
+            'mesdeteccion': pd.Categorical(MESES, categories=MESES, ordered=True),
+        }))
+
+        self.cube = FireCube.from_fires(incendios.assign(comunidad=self.comunidad))
+        self.cube.version = self.version
+
+    def _shared(self, frame):
+        frame = ReadOnlyFrame(frame, copy=False)
+        frame.attrs['version'] = self.version
+        return frame
+
+
+@st.cache_resource(max_entries=4)
+def _index(data_dir, version):
+    return read_index(data_dir)
+
+
+@st.cache_resource(max_entries=8)
+def _region(data_dir, idcomunidad, version):
+    info = _index(data_dir, version)[idcomunidad]
+    return Region(Path(data_dir) / REGIONS_DIRNAME, info)
+
+
+def _version(data_dir):
+    # index.json is written last, when the whole tree is in place.
+    stat = os.stat(Path(data_dir) / REGIONS_DIRNAME / INDEX_FILE)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def get_regions(data_dir='data'):
+    """The comunidades with partitions in ``data_dir``, by ``idcomunidad``."""
+    return _index(str(data_dir), _version(data_dir))
+
+
+def get_region(idcomunidad, data_dir='data'):
+    """Data of one comunidad, read once per server process and version of the partitions."""
+    return _region(str(data_dir), idcomunidad, _version(data_dir))
@@ -0,0 +1,264 @@
+"""Pre-aggregated fire rollups for year range queries.
+
+The fire table is folded once into a dense cube indexed by
+(comunidad, anio, mes) holding the number of fires, the number of serious
+fires and the burned hectares.
+Cumulative sums along the year axis let any ``from_year``/``to_year`` range
+be answered without touching the raw rows.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dashboard.store import MESES, get_data_from_csv, get_dataset_registry
+
+# Fires burning more than this many hectares count as serious.
+SERIOUS_FIRE_HA = 500
+
+FIRE_COLUMNS = ['comunidad', 'anio', 'mesdeteccion', 'perdidassuperficiales']
+
+# Fires without a recognised detection month are kept in an extra bucket so
+# that yearly and regional totals still add up.
+N_MESES = len(MESES) + 1
+
+
+class FireCube:
+    """Counts, serious fire counts and burned hectares per (comunidad, anio, mes)."""
+
+    # Version of the fire data the cube was built from, if known.
+    version = None
+
+    def __init__(self, comunidades, first_year, counts, hectareas, graves):
+        self.comunidades = comunidades
+        self.first_year = first_year
+        self.counts = counts
+        self.hectareas = hectareas
+        self.graves = graves
+
+        # Leading zero column so that a range is cum[hi] - cum[lo].
+        self._cum_count = self._cumulative(counts.sum(axis=2))
+        self._cum_ha = self._cumulative(hectareas.sum(axis=2))
+
+    @staticmethod
+    def _cumulative(per_reg_year):
+        cum = np.zeros((per_reg_year.shape[0], per_reg_year.shape[1] + 1), dtype=per_reg_year.dtype)
+        np.cumsum(per_reg_year, axis=1, out=cum[:, 1:])
+        return cum
+
+    @classmethod
+    def from_fires(cls, fires):
+        """Build the cube from a frame with comunidad, anio, mesdeteccion and perdidassuperficiales."""
+        comunidad = pd.Categorical(fires['comunidad'])
+        comunidades = comunidad.categories
+        anio = fires['anio'].to_numpy()
+        first_year = int(anio.min())
+        n_years = int(anio.max()) - first_year + 1
+
+        mes = pd.Categorical(fires['mesdeteccion'], categories=MESES).codes.astype(np.int64)
+        mes[mes < 0] = N_MESES - 1
+
+        valid = comunidad.codes >= 0
+        cell = (comunidad.codes[valid].astype(np.int64) * n_years + (anio[valid] - first_year)) * N_MESES + mes[valid]
+        size = len(comunidades) * n_years * N_MESES
+        shape = (len(comunidades), n_years, N_MESES)
+
+        ha = fires['perdidassuperficiales'].fillna(0).to_numpy()[valid]
+        counts = np.bincount(cell, minlength=size).reshape(shape)
+        hectareas = np.bincount(cell, weights=ha, minlength=size).reshape(shape)
+        graves = np.bincount(cell[ha > SERIOUS_FIRE_HA], minlength=size).reshape(shape)
+        return cls(comunidades, first_year, counts, hectareas, graves)
+
+    def merged(self, other):
+        """Cube holding the fires of both cubes, e.g. after new fires were appended."""
+        comunidades = self.comunidades.union(other.comunidades)
+        first_year = min(self.first_year, other.first_year)
+        shape = (len(comunidades), max(self.last_year, other.last_year) - first_year + 1, N_MESES)
+
+        arrays = []
+        for name in ('counts', 'hectareas', 'graves'):
+            total = np.zeros(shape, dtype=np.result_type(getattr(self, name), getattr(other, name)))
+            for cube in (self, other):
+                regs = comunidades.get_indexer(cube.comunidades)
+                years = slice(cube.first_year - first_year, cube.last_year - first_year + 1)
+                total[regs, years] += getattr(cube, name)
+            arrays.append(total)
+        return FireCube(comunidades, first_year, *arrays)
+
+    @property
+    def last_year(self):
+        return self.first_year + self.counts.shape[1] - 1
+
+    def _bounds(self, from_year, to_year):
+        lo = min(max(from_year, self.first_year), self.last_year + 1) - self.first_year
+        hi = max(min(to_year, self.last_year) + 1, self.first_year) - self.first_year
+        return lo, max(lo, hi)
+
+    def totals(self, from_year, to_year):
+        """Number of fires and burned hectares in the range, in O(1) per comunidad."""
+        lo, hi = self._bounds(from_year, to_year)
+        count = self._cum_count[:, hi] - self._cum_count[:, lo]
+        ha = self._cum_ha[:, hi] - self._cum_ha[:, lo]
+        return int(count.sum()), float(ha.sum())
+
+    def per_comunidad(self, from_year, to_year):
+        """One row per comunidad with fires in the range: number of fires and burned hectares."""
+        lo, hi = self._bounds(from_year, to_year)
+        data = pd.DataFrame({
+            'comunidad': self.comunidades,
+            'total': self._cum_count[:, hi] - self._cum_count[:, lo],
+            'hectareas': self._cum_ha[:, hi] - self._cum_ha[:, lo],
+        })
+        return data[data['total'] > 0].reset_index(drop=True)
+
+    def per_year(self, from_year, to_year):
+        """One row per year with fires: burned hectares (``total``) and number of fires (``count``)."""
+        lo, hi = self._bounds(from_year, to_year)
+        data = pd.DataFrame({
+            'anio': np.arange(self.first_year + lo, self.first_year + hi),
+            'total': self.hectareas[:, lo:hi].sum(axis=(0, 2)),
+            'count': self.counts[:, lo:hi].sum(axis=(0, 2)),
+        })
+        return data[data['count'] > 0].reset_index(drop=True)
+
+    def per_period(self, from_year, to_year, width=5):
+        """Per year figures summed into ``width``-year periods aligned on multiples of ``width``.
+
+        ``periodo`` labels each period as ``"<first year>-<last year>"``.
+        """
+        data = self.per_year(from_year, to_year)
+        inicio = (data['anio'] - data['anio'] % width).rename('inicio')
+        data = data.groupby(inicio).agg(total=('total', 'sum'), count=('count', 'sum')).reset_index()
+        data.insert(0, 'periodo', data['inicio'].astype(str) + '-' + (data['inicio'] + width - 1).astype(str))
+        return data.drop(columns='inicio')
+
+    def per_month(self, comunidad=None, from_year=None, to_year=None):
+        """One row per month (``mesdeteccion``) with fires, serious fires and hectares.
+
+        Covers every year unless a range is given, and every comunidad unless
+        ``comunidad`` is given.
+        """
+        lo, hi = self._bounds(
+            self.first_year if from_year is None else from_year,
+            self.last_year if to_year is None else to_year,
+        )
+        if comunidad is None:
+            regs = slice(None)
+        else:
+            regs = [i for i, name in enumerate(self.comunidades) if name == comunidad]
+
+        return pd.DataFrame({
+            'mesdeteccion': MESES,
+            'count': self.counts[regs, lo:hi, :len(MESES)].sum(axis=(0, 1)),
+            'graves': self.graves[regs, lo:hi, :len(MESES)].sum(axis=(0, 1)),
+            'hectareas': self.hectareas[regs, lo:hi, :len(MESES)].sum(axis=(0, 1)),
+        })
+
+    def cells(self):
+        """Long form of the non empty cells, keyed by (comunidad, anio, mes).
+
+        ``mes`` runs from 1 to 12; fires with an unknown month get ``mes`` 13.
+        """
+        reg, year, mes = np.nonzero(self.counts)
+        return pd.DataFrame({
+            'comunidad': self.comunidades[reg],
+            'anio': self.first_year + year,
+            'mes': mes + 1,
+            'count': self.counts[reg, year, mes],
+            'graves': self.graves[reg, year, mes],
+            'hectareas': self.hectareas[reg, year, mes],
+        })
+
+
+def ndvi_previo_stats(source, from_year, to_year):
+    """NDVI and burned area per (fortnight, anio, provincia) of the fires in the range.
+
+    ``source`` is the NDVI before fire frame or a ``DuckDBNdviPrevio``.
+    """
+    if not isinstance(source, pd.DataFrame):
+        return source.stats(from_year, to_year)
+
+    data = source[(source.anio >= from_year) & (source.anio <= to_year)].groupby(["fortnight", "anio", "provincia"], observed=True).agg({
+        "NDVI_previo": ["mean"],
+        "perdidassuperficiales": ["sum", "mean", "max"],
+        "geometry": "count"
+    }).reset_index()
+
+    data.columns = [
+        "_".join(col).strip("_") if isinstance(col, tuple) else col
+        for col in data.columns
+    ]
+    return data.rename(columns={"geometry_count": "n_incendios"})
+
+
+def _duckdb_backend():
+    # Imported on demand: the backend is optional and imports this module.
+    from dashboard import duckdb_backend
+    return duckdb_backend if duckdb_backend.ENABLED else None
+
+
+class LiveFireCube:
+    """Fire cube of a file, kept up to date as the dataset registry refreshes it.
+
+    Appended fires are folded into a small cube and merged into the current
+    one; a replaced file makes the next ``get`` build the cube again.
+    """
+
+    def __init__(self, file_path, registry):
+        self.file_path = file_path
+        self._cube = None
+        self._lock = threading.Lock()
+        registry.subscribe(file_path, self._changed)
+
+    def _changed(self, rows, version):
+        with self._lock:
+            if rows is None or self._cube is None or len(rows) == 0 or not set(FIRE_COLUMNS) <= set(rows.columns):
+                self._cube = None
+                return
+            cube = self._cube.merged(FireCube.from_fires(rows))
+            cube.version = version
+            self._cube = cube
+
+    def get(self):
+        fires = get_data_from_csv(self.file_path, FIRE_COLUMNS)
+        with self._lock:
+            if self._cube is not None and self._cube.version == fires.attrs['version']:
+                return self._cube
+
+        cube = FireCube.from_fires(fires)
+        cube.version = fires.attrs['version']
+        with self._lock:
+            self._cube = cube
+        return cube
+
+
+@st.cache_resource
+def _live_fire_cube(file_path):
+    return LiveFireCube(file_path, get_dataset_registry())
+
+
+@st.cache_resource(max_entries=4)
+def _duckdb_fires(file_path, version):
+    return _duckdb_backend().DuckDBFires(file_path)
+
+
+def get_fire_cube(file_path):
+    """Fire cube for ``file_path``, built once per server process and version of the file.
+
+    With ``DASHBOARD_BACKEND=duckdb`` the same queries are answered by DuckDB
+    from the file instead.
+    """
+    backend = _duckdb_backend()
+    if backend is not None:
+        return _duckdb_fires(file_path, backend.file_version(file_path))
+    return _live_fire_cube(file_path).get()
+
+
+def get_ndvi_previo(file_path):
+    """Source of ``ndvi_previo_stats``: the shared frame, or DuckDB queries over the file."""
+    backend = _duckdb_backend()
+    if backend is not None:
+        return backend.DuckDBNdviPrevio(file_path)
+    return get_data_from_csv(file_path, ['fortnight', 'anio', 'provincia', 'NDVI_previo', 'perdidassuperficiales', 'geometry'])
@@ -0,0 +1,395 @@
+"""Static snapshot of the dashboard's charts, served without Python.
+
+Every page of ``streamlit_app.py`` has its charts listed in ``views()``, with
+the data files they read. Each chart is rendered to a standalone Vega-Lite
+JSON file for the default state of the filters and for a grid of year
+ranges (every ``--step`` years, the full range included) and, on the
+regional page, every comunidad and pollutant:
+
+    python -m dashboard.snapshot --data data --out snapshot --step 5
+
+writes ``snapshot/<page>/<view>/<filters>.json``, a ``manifest.json``
+listing them and one HTML file per page that draws them with vega-embed
+and offers the same filters. Any static file server can serve the
+directory.
+
+A view is rendered again only when the contents of its data files or the
+code of its chart builders changed since the last run (digests are kept in
+``snapshot/.snapshot.json``).
+"""
+
+import argparse
+import ast
+import hashlib
+import inspect
+import json
+import shutil
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+from dashboard import chart_cache, geo, regions
+from dashboard.chart_cache import chart_to_spec, spec_to_json
+from dashboard.charts import comunidad, spain
+from dashboard.defaults import (
+    COLORES,
+    COLUMNAS_CONTAMINANTE,
+    COLUMNAS_ICA,
+    COLUMNAS_INCENDIOS_NDVI,
+    COLUMNAS_NDVI_MENSUAL,
+    COMUNIDAD,
+    CONTAMINANTE,
+    METODO,
+    VENTANA,
+)
+from dashboard.ica import STATION
+from dashboard.pipeline import State
+from dashboard.pollutants import POLLUTANT_FILES
+from dashboard.rollups import FIRE_COLUMNS, FireCube
+from dashboard.store import DatasetRegistry
+from dashboard.timeindex import YearIndex
+
+APP = 'streamlit_app.py'
+STATE_FILE = '.snapshot.json'
+
+# Inputs, relative to the data directory.
+POLLUTANTS = [Path(path).name for path in POLLUTANT_FILES.values()]
+REGION_INDEX = f'{regions.REGIONS_DIRNAME}/{regions.INDEX_FILE}'
+
+# A chart of a page: ``data(sources, params)`` returns the builder's
+# positional data and its filters for one point of ``grid(sources)``, a
+# list of parameter dicts ({} for charts without filters).
+View = namedtuple('View', ['page', 'name', 'builder', 'inputs', 'data', 'grid'])
+
+
+class Sources:
+    """The pages' datasets, read from ``data_dir`` and built once per run."""
+
+    def __init__(self, data_dir):
+        self.data_dir = Path(data_dir)
+        self.registry = DatasetRegistry()
+        self._built = {}
+
+    def _once(self, key, build):
+        if key not in self._built:
+            self._built[key] = build()
+        return self._built[key]
+
+    def frame(self, name, columns=None):
+        return self.registry.get(str(self.data_dir / name), columns)
+
+    def cube(self):
+        return self._once('cube', lambda: FireCube.from_fires(self.frame('incendios.csv', FIRE_COLUMNS)))
+
+    def regions(self):
+        return self._once('regions', lambda: regions.read_index(self.data_dir))
+
+    def region(self, idcomunidad):
+        return self._once(('region', idcomunidad), lambda: regions.Region(
+            self.data_dir / regions.REGIONS_DIRNAME, self.regions()[idcomunidad]))
+
+    def ica(self):
+        return self._once('ica', lambda: YearIndex(
+            self.frame('df_ica_diario.csv', COLUMNAS_ICA), 'anio', by=['Incendio', 'label']))
+
+    def pollutants(self):
+        return [nombre for nombre, path in POLLUTANT_FILES.items() if (self.data_dir / Path(path).name).exists()]
+
+    def pollutant(self, nombre):
+        return self._once(('pollutant', nombre), lambda: YearIndex(
+            self.frame(Path(POLLUTANT_FILES[nombre]).name, COLUMNAS_CONTAMINANTE),
+            'AÑO', by=['mesdeteccion'], value='VALOR_FINAL'))
+
+    def geometries(self):
+        def load():
+            path = self.data_dir / 'NDVI_previo_incendios.csv'
+            geo.build(path)
+            return geo.FireGeometries(geo.geo_path(path))
+        return self._once('geometries', load)
+
+
+def year_ranges(first, last, step):
+    """Ranges whose ends fall every ``step`` years from ``first``, or on ``last``."""
+    ends = sorted({*range(first, last + 1, step), last})
+    return [(a, b) for a in ends for b in ends if a <= b]
+
+
+def _years(first, last, step):
+    return [{'from_year': a, 'to_year': b} for a, b in year_ranges(first, last, step)]
+
+
+def _spain_years(step):
+    def grid(src):
+        cube = src.cube()
+        return _years(cube.first_year, cube.last_year, step)
+    return grid
+
+
+def _pollutant_years(step):
+    # Only comunidades with air quality stations show the pollutant charts.
+    def grid(src):
+        return [
+            {'comunidad': idcomunidad, 'contaminante': nombre, **years}
+            for idcomunidad, region in src.regions().items() if region['calidad_aire']
+            for nombre in src.pollutants()
+            for years in _years(src.pollutant(nombre).first_year, src.pollutant(nombre).last_year, step)
+        ]
+    return grid
+
+
+def _ica_years(step):
+    # The pies follow the year slider, whose ends depend on the pollutant.
+    def grid(src):
+        ranges = {tuple(p[k] for k in ('from_year', 'to_year')) for p in _pollutant_years(step)(src)}
+        return [{'from_year': a, 'to_year': b} for a, b in sorted(ranges)]
+    return grid
+
+
+def _regions(src):
+    return [{'comunidad': idcomunidad} for idcomunidad in src.regions()]
+
+
+def _static(src):
+    return [{}]
+
+
+def _first_station(index, region):
+    estaciones = index.frame.loc[index.frame['PROVINCIA'].isin(region.provincias), STATION]
+    return tuple(int(v) for v in estaciones.drop_duplicates().sort_values(STATION).iloc[0])
+
+
+def views(step=5):
+    spain_years = _spain_years(step)
+    pollutant_years = _pollutant_years(step)
+
+    def years(p):
+        return {'from_year': p['from_year'], 'to_year': p['to_year']}
+
+    return [
+        View('spain', 'fires_per_reg_barchart', spain.fires_per_reg_barchart, ['incendios.csv'],
+             lambda src, p: ((src.cube(),), {**years(p), 'colores': COLORES}), spain_years),
+        View('spain', 'bubbles', spain.bubbles, ['merged_data.csv'],
+             lambda src, p: ((src.frame('merged_data.csv', COLUMNAS_INCENDIOS_NDVI),), years(p)),
+             spain_years),
+        View('spain', 'fires_per_5year', spain.fires_per_5year, ['incendios.csv'],
+             lambda src, p: ((src.cube(),), {**years(p), 'colores': COLORES}), spain_years),
+        View('spain', 'fires_per_year', spain.fires_per_year, ['incendios.csv'],
+             lambda src, p: ((src.cube(),), {**years(p), 'colores': COLORES}), spain_years),
+        View('spain', 'serious_fires_ndvi', spain.serious_fires_ndvi, ['NDVI_mensual.csv', 'incendios.csv'],
+             lambda src, p: ((src.frame('NDVI_mensual.csv', COLUMNAS_NDVI_MENSUAL), src.cube()), {'colores': COLORES}),
+             _static),
+        View('spain', 'previous_ndvi', spain.previous_ndvi, ['NDVI_previo_incendios.csv'],
+             lambda src, p: ((src.frame('NDVI_previo_incendios.csv', [
+                 'fortnight', 'anio', 'provincia', 'NDVI_previo', 'perdidassuperficiales', 'geometry']),), years(p)),
+             spain_years),
+        View('spain', 'fire_map', spain.fire_map, ['NDVI_previo_incendios.csv'],
+             lambda src, p: ((src.geometries(),), {
+                 'viewport': src.geometries().viewport(), **years(p), 'color': next(iter(spain.COLORES_MAPA))}),
+             spain_years),
+        View('comunidad', 'plot_ica_pies', comunidad.plot_ica_pies, ['df_ica_diario.csv'],
+             lambda src, p: ((src.ica(),), years(p)), _ica_years(step)),
+        View('comunidad', 'plot_graph_contaminant_boxes', comunidad.plot_graph_contaminant_boxes,
+             [REGION_INDEX, 'bandas_contaminantes.csv', *POLLUTANTS],
+             lambda src, p: ((src.region(p['comunidad']).incendios, src.frame('bandas_contaminantes.csv'),
+                              src.pollutant(p['contaminante'])),
+                             {'nombre_contaminante': p['contaminante'], **years(p)}),
+             pollutant_years),
+        View('comunidad', 'plot_fire_NDVI_monthly', comunidad.plot_fire_NDVI_monthly, [REGION_INDEX],
+             lambda src, p: ((src.region(p['comunidad']).cube, src.region(p['comunidad']).ndvi_mensual),
+                             {'colores': COLORES, 'comunidad': src.region(p['comunidad']).comunidad}),
+             _regions),
+        View('comunidad', 'plot_fire_contaminant_monthly', comunidad.plot_fire_contaminant_monthly,
+             [REGION_INDEX, *POLLUTANTS],
+             lambda src, p: ((src.region(p['comunidad']).cube, src.pollutant(p['contaminante'])), {
+                 'nombre_contaminante': p['contaminante'], 'colores': COLORES, **years(p),
+                 'comunidad': src.region(p['comunidad']).comunidad}),
+             pollutant_years),
+        View('comunidad', 'plot_fire_lag_response', comunidad.plot_fire_lag_response,
+             [REGION_INDEX, *POLLUTANTS],
+             lambda src, p: ((src.region(p['comunidad']).incendios, src.pollutant(p['contaminante']).frame),
+                             {'nombre_contaminante': p['contaminante'], 'window': VENTANA, **years(p)}),
+             pollutant_years),
+        View('comunidad', 'plot_station_series', comunidad.plot_station_series,
+             [REGION_INDEX, *POLLUTANTS],
+             lambda src, p: ((src.region(p['comunidad']).incendios, src.pollutant(p['contaminante'])), {
+                 'nombre_contaminante': p['contaminante'],
+                 'estacion': _first_station(src.pollutant(p['contaminante']), src.region(p['comunidad'])),
+                 **years(p), 'metodo': METODO}),
+             pollutant_years),
+    ]
+
+
+def app_pages(app=APP):
+    """(script stem, title) of every ``st.Page`` of the app, in order."""
+    pages = []
+    for node in ast.walk(ast.parse(Path(app).read_text(encoding='utf-8'))):
+        if isinstance(node, ast.Call) and getattr(node.func, 'attr', None) == 'Page' and node.args:
+            title = next((kw.value.value for kw in node.keywords if kw.arg == 'title'), None)
+            stem = Path(node.args[0].value).stem
+            pages.append((stem, title or stem))
+    return pages
+
+
+def file_name(params):
+    """File of one point of a view's grid, e.g. ``4_PM10_2009-2016.json``."""
+    parts = [str(params[key]) for key in ('comunidad', 'contaminante') if key in params]
+    if 'from_year' in params:
+        parts.append(f"{params['from_year']}-{params['to_year']}")
+    return '_'.join(parts or ['default']) + '.json'
+
+
+def view_digest(view, state, data_dir):
+    digest = hashlib.sha256(f'{view.page}/{view.name}'.encode())
+    # The builders' module and the spec post-processing are code inputs too.
+    for module in (inspect.getmodule(view.builder), chart_cache, sys.modules[__name__]):
+        digest.update(Path(inspect.getsourcefile(module)).read_bytes())
+    for name in view.inputs:
+        path = Path(data_dir) / name
+        if path.exists():
+            digest.update(name.encode())
+            digest.update(state.file_digest(path).encode())
+    return digest.hexdigest()
+
+
+def render_view(view, sources, out_dir):
+    """Write every point of ``view``'s grid; returns the manifest entries."""
+    target = Path(out_dir) / view.page / view.name
+    tmp = target.with_name(target.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    entries = []
+    for params in view.grid(sources):
+        data, filters = view.data(sources, params)
+        spec = chart_to_spec(view.builder(*data, **filters))
+        (tmp / file_name(params)).write_text(spec_to_json(spec), encoding='utf-8')
+        entries.append({'params': params, 'file': f'{view.page}/{view.name}/{file_name(params)}'})
+
+    shutil.rmtree(target, ignore_errors=True)
+    tmp.rename(target)
+    return entries
+
+
+def build(data_dir='data', out_dir='snapshot', step=5, force=False, app=APP, out=sys.stderr):
+    """Render the views whose inputs changed and rewrite the manifest and pages."""
+    data_dir, out_dir = Path(data_dir), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    state = State(out_dir, STATE_FILE)
+    manifest_path = out_dir / 'manifest.json'
+    previous = json.loads(manifest_path.read_text()) if manifest_path.exists() else {'views': {}}
+
+    pages = app_pages(app)
+    known = {page for page, _ in pages}
+    sources = Sources(data_dir)
+    manifest = {'pages': [{'page': page, 'title': title} for page, title in pages], 'views': {}}
+    if (data_dir / REGION_INDEX).exists():
+        comunidades = sources.regions()
+        manifest['labels'] = {'comunidad': {i: region['nombre'] for i, region in comunidades.items()}}
+        manifest['defaults'] = {
+            'contaminante': CONTAMINANTE,
+            'comunidad': next((i for i, region in comunidades.items() if region['comunidad'] == COMUNIDAD), None),
+        }
+
+    for view in views(step):
+        if view.page not in known:
+            continue
+        key = f'{view.page}/{view.name}'
+        digest = view_digest(view, state, data_dir) + f':{step}'
+        if not force and state.stages.get(key) == digest and key in previous['views'] \
+                and (out_dir / view.page / view.name).is_dir():
+            manifest['views'][key] = previous['views'][key]
+            print(f'{key:45} up to date', file=out)
+            continue
+
+        manifest['views'][key] = {'page': view.page, 'name': view.name, 'specs': render_view(view, sources, out_dir)}
+        state.stages[key] = digest
+        state.save()
+        print(f"{key:45} {len(manifest['views'][key]['specs'])} specs", file=out)
+
+    manifest_path.write_text(json.dumps(manifest, indent=1, ensure_ascii=False), encoding='utf-8')
+    for page, title in pages:
+        (out_dir / f'{page}.html').write_text(PAGE_HTML.replace('{{page}}', page).replace('{{title}}', title), encoding='utf-8')
+    (out_dir / 'index.html').write_text(INDEX_HTML.replace('{{links}}', '\n'.join(
+        f'<li><a href="{page}.html">{title}</a></li>' for page, title in pages)), encoding='utf-8')
+    return manifest
+
+
+INDEX_HTML = """<!doctype html>
+<html lang="es"><head><meta charset="utf-8"><title>Incendios forestales</title></head>
+<body><h1>Incendios forestales</h1><ul>
+{{links}}
+</ul></body></html>
+"""
+
+# Draws the page's views for the chosen comunidad, pollutant and year
+# range; views without a spec for the range (e.g. outside a pollutant's
+# years) fall back to their widest range, and views without any for the
+# comunidad or pollutant are left empty.
+PAGE_HTML = """<!doctype html>
+<html lang="es"><head><meta charset="utf-8"><title>{{title}}</title>
+<script src="https://cdn.jsdelivr.net/npm/vega@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-lite@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-embed@6"></script>
+<style>body{font-family:sans-serif;margin:2em} .view{margin:2em 0} select{margin-right:1em}</style>
+</head><body>
+<p><a href="index.html">Inicio</a></p>
+<h1>{{title}}</h1>
+<div id="filtros"></div>
+<div id="vistas"></div>
+<script>
+const PAGE = "{{page}}";
+fetch("manifest.json").then(r => r.json()).then(manifest => {
+  const views = Object.values(manifest.views).filter(v => v.page === PAGE);
+  const all = views.flatMap(v => v.specs.map(s => s.params));
+  // Numbers (years, comunidad ids) in numeric order, names alphabetically.
+  const order = (a, b) => typeof a === "number" && typeof b === "number" ? a - b : String(a).localeCompare(String(b));
+  const values = key => [...new Set(all.map(p => p[key]).filter(v => v !== undefined))].sort(order);
+  const labels = manifest.labels || {};
+  const defaults = manifest.defaults || {};
+  const filtros = document.getElementById("filtros");
+  const selects = {};
+  const filters = [["comunidad", "Comunidad"], ["contaminante", "Contaminante"], ["from_year", "Desde"], ["to_year", "Hasta"]];
+  for (const [key, label] of filters) {
+    const options = values(key);
+    if (!options.length) continue;
+    const select = document.createElement("select");
+    options.forEach(v => select.add(new Option((labels[key] || {})[v] || v, v)));
+    const fallback = key === "to_year" ? options[options.length - 1] : options[0];
+    select.value = options.some(v => String(v) === String(defaults[key])) ? defaults[key] : fallback;
+    select.onchange = draw;
+    filtros.append(label + " ", select);
+    selects[key] = select;
+  }
+  const container = document.getElementById("vistas");
+  const divs = views.map(v => { const d = document.createElement("div"); d.className = "view"; container.append(d); return d; });
+  function draw() {
+    const chosen = Object.fromEntries(Object.entries(selects).map(([k, s]) => [k, s.value]));
+    const same = (s, keys) => Object.entries(s.params).every(([k, v]) => !keys.includes(k) || !(k in chosen) || String(v) === chosen[k]);
+    views.forEach((view, i) => {
+      const candidates = view.specs.filter(s => same(s, ["comunidad", "contaminante"]))
+        .sort((a, b) => (b.params.to_year - b.params.from_year) - (a.params.to_year - a.params.from_year));
+      const spec = candidates.find(s => same(s, ["from_year", "to_year"])) || candidates[0];
+      if (spec) vegaEmbed(divs[i], spec.file, {actions: false});
+      else divs[i].replaceChildren();
+    });
+  }
+  draw();
+});
+</script>
+</body></html>
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='data', help='directory with the data files (default: data)')
+    parser.add_argument('--out', default='snapshot', help='output directory (default: snapshot)')
+    parser.add_argument('--step', type=int, default=5, help='years between the ends of the year ranges (default: 5)')
+    parser.add_argument('--force', action='store_true', help='render every view even if it is up to date')
+    parser.add_argument('--app', default=APP, help=f'Streamlit entry point listing the pages (default: {APP})')
+    args = parser.parse_args(argv)
+    build(args.data, args.out, args.step, args.force, args.app)
+
+
+if __name__ == '__main__':
+    main()
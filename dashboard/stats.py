@@ -0,0 +1,48 @@
+"""Summary statistics computed on the server before charting."""
+
+import numpy as np
+import pandas as pd
+
+
+def boxplot_summary(df, group, value, extent=1.5, max_outliers=50):
+    """Quartiles, whiskers and outliers of ``value`` for every ``group``.
+
+    Follows Vega-Lite's ``mark_boxplot`` definition: whiskers reach the most
+    extreme values within ``extent`` times the interquartile range and
+    anything beyond is an outlier. At most ``max_outliers`` evenly spaced
+    outliers (always including the extremes) are kept per group so the
+    result has a bounded size whatever the input length.
+
+    Returns ``(summary, outliers)``: one row per group with ``count``,
+    ``lower``, ``q1``, ``median``, ``q3`` and ``upper``, and one row per kept
+    outlier.
+    """
+    summary, outliers = [], []
+
+    for key, values in df.groupby(group, observed=True)[value]:
+        v = np.sort(values.dropna().to_numpy(dtype='float64'))
+        if not len(v):
+            continue
+
+        q1, median, q3 = np.quantile(v, [0.25, 0.5, 0.75])
+        low_fence = q1 - extent * (q3 - q1)
+        high_fence = q3 + extent * (q3 - q1)
+        inside = v[(v >= low_fence) & (v <= high_fence)]
+        summary.append({
+            group: key,
+            'count': len(v),
+            'lower': inside[0],
+            'q1': q1,
+            'median': median,
+            'q3': q3,
+            'upper': inside[-1],
+        })
+
+        out = v[(v < low_fence) | (v > high_fence)]
+        if len(out) > max_outliers:
+            out = out[np.linspace(0, len(out) - 1, max_outliers).round().astype(int)]
+        outliers.append(pd.DataFrame({group: key, value: out}))
+
+    summary = pd.DataFrame(summary, columns=[group, 'count', 'lower', 'q1', 'median', 'q3', 'upper'])
+    outliers = pd.concat(outliers, ignore_index=True) if outliers else pd.DataFrame(columns=[group, value])
+    return summary, outliers
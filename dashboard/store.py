@@ -0,0 +1,463 @@
+"""Columnar data store behind ``get_data_from_csv``.
+
+Every CSV in ``data/`` is converted once into a Parquet file with an explicit
+schema: dates are parsed, names are categoricals and integer ids are
+downcast. Pages then read back only the columns their charts use.
+
+Derived columns declared in ``DERIVED`` are computed with vectorized
+expressions the first time they are requested and then cached next to the
+loaded columns, so chart code only selects and filters.
+
+Loaded columns are held once per server process in a ``DatasetRegistry`` and
+handed out as read-only frames that share the same buffers, so sessions and
+reruns never copy them.
+
+The registry fingerprints every file it loads (size, modification time and
+digests of its first bytes and of the bytes before its end) and checks it
+again at most every ``REFRESH_INTERVAL`` seconds. When a CSV only grew, the
+new rows are parsed on their own and appended to the loaded columns;
+any other change drops the file so that it is loaded again.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dashboard.instrumentation import timed
+
+# Sharing buffers between sessions is only safe with copy-on-write, which is
+# always on from pandas 3.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+MESES = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre']
+
+# Parquet copies live next to their CSV in this directory.
+PARQUET_DIRNAME = '.parquet'
+
+# Seconds between two checks of a loaded file for changes.
+REFRESH_INTERVAL = float(os.environ.get('DASHBOARD_REFRESH_INTERVAL', 5))
+
+# Bytes hashed at the start of a file and before the end of its loaded part.
+SAMPLE_BYTES = 1 << 16
+
+# Column kinds: 'date' is parsed once, 'category' is dictionary encoded,
+# 'int' is downcast to the smallest integer type that fits and 'float'/'str'
+# are kept as is. Columns that are not listed keep their inferred dtype
+# (integers are downcast as well).
+POLLUTANT_SCHEMA = {
+    'PROVINCIA': 'int',
+    'MUNICIPIO': 'int',
+    'ESTACION': 'int',
+    'PARAMETRO': 'int',
+    'AÑO': 'int',
+    'MES': 'int',
+    'DIA': 'int',
+    'FECHA': 'date',
+    'VALOR_MEDIO': 'float',
+    'VALOR': 'float',
+    'VALOR_FINAL': 'float',
+    'CONTAMINANTE': 'category',
+}
+
+SCHEMAS = {
+    'incendios.csv': {
+        'id': 'int',
+        'idcomunidad': 'int',
+        'comunidad': 'category',
+        'idprovincia': 'int',
+        'provincia': 'category',
+        'idmunicipio': 'int',
+        'anio': 'int',
+        'fecha': 'date',
+        'mesdeteccion': 'category',
+        'perdidassuperficiales': 'float',
+    },
+    'merged_data.csv': {
+        'idcomunidad': 'int',
+        'comunidad_x': 'category',
+        'anio': 'int',
+        'total': 'float',
+        'count': 'int',
+        'comunidad_y': 'category',
+        'ndvi_mean': 'float',
+    },
+    'NDVI_mensual.csv': {
+        'month': 'int',
+        'NDVI': 'float',
+        'Mes': 'category',
+        'mesdeteccion': 'category',
+    },
+    'NDVI_andalucia_mensual.csv': {
+        'mes': 'int',
+        'ndvi_mean': 'float',
+        'mesdeteccion': 'category',
+    },
+    'NDVI_previo_incendios.csv': {
+        'fortnight': 'int',
+        'anio': 'int',
+        'provincia': 'category',
+        'NDVI_previo': 'float',
+        'perdidassuperficiales': 'float',
+        'geometry': 'str',
+    },
+    'dias_incendio_andalucia.csv': {
+        'fecha': 'date',
+        'idprovincia': 'int',
+        'idmunicipio': 'int',
+        'perdidassuperficiales': 'float',
+    },
+    'df_ica_diario.csv': {
+        'FECHA': 'date',
+        'label': 'category',
+        'anio': 'int',
+        'fecha': 'date',
+        'perdidassuperficiales': 'float',
+        'Incendio': 'category',
+    },
+    'bandas_contaminantes.csv': {
+        'contaminante': 'category',
+        'min': 'float',
+        'max': 'float',
+        'color': 'str',
+        'label': 'str',
+    },
+    'o3.csv': POLLUTANT_SCHEMA,
+    'so2.csv': POLLUTANT_SCHEMA,
+    'no2.csv': POLLUTANT_SCHEMA,
+    'pm25.csv': POLLUTANT_SCHEMA,
+    'pm10.csv': POLLUTANT_SCHEMA,
+}
+
+
+
+def year_of(column):
+    """Derivation: calendar year of a date column."""
+    return lambda df: df[column].dt.year.astype('int16')
+
+
+def month_name_of(column):
+    """Derivation: Spanish month name (ordered categorical) of a 1-12 month column."""
+    def derive(df):
+        mes = df[column].to_numpy()
+        codes = np.where((mes >= 1) & (mes <= 12), mes - 1, -1)
+        return pd.Categorical.from_codes(codes, categories=MESES, ordered=True)
+    return derive
+
+
+# Derived column -> (source columns, vectorized function of a frame holding
+# the sources). A derived column is always computed, even if the file has a
+# column with the same name.
+POLLUTANT_DERIVED = {
+    'mesdeteccion': (['MES'], month_name_of('MES')),
+}
+
+DERIVED = {
+    'dias_incendio_andalucia.csv': {
+        'anio': (['fecha'], year_of('fecha')),
+    },
+    'NDVI_andalucia_mensual.csv': {
+        'mesdeteccion': (['mes'], month_name_of('mes')),
+    },
+    'o3.csv': POLLUTANT_DERIVED,
+    'so2.csv': POLLUTANT_DERIVED,
+    'no2.csv': POLLUTANT_DERIVED,
+    'pm25.csv': POLLUTANT_DERIVED,
+    'pm10.csv': POLLUTANT_DERIVED,
+}
+
+def apply_schema(df, schema):
+    """Cast the columns of a freshly read CSV to the kinds declared in ``schema``."""
+    df = df.drop(columns=[col for col in df.columns if col.startswith('Unnamed:')])
+
+    for col in df.columns:
+        kind = schema.get(col)
+        if kind == 'date':
+            df[col] = pd.to_datetime(df[col], format='ISO8601', errors='coerce')
+        elif kind == 'category':
+            df[col] = df[col].astype('category')
+        elif kind == 'float':
+            df[col] = df[col].astype('float64')
+        elif kind == 'str':
+            df[col] = df[col].astype('string')
+        elif kind == 'int' or (kind is None and pd.api.types.is_integer_dtype(df[col])):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    return df
+
+
+def add_derived_columns(file_name, df):
+    """``df`` plus every derived column declared for ``file_name``."""
+    derived = DERIVED.get(file_name, {})
+    return df.assign(**{col: function(df) for col, (sources, function) in derived.items()})
+
+
+def parquet_path(file_path):
+    """Location of the Parquet copy of ``file_path``.
+
+    The schema is part of the name so that editing ``SCHEMAS`` invalidates the
+    previous conversion.
+    """
+    file_path = Path(file_path)
+    schema = SCHEMAS.get(file_path.name, {})
+    digest = hashlib.sha1(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:8]
+    return file_path.parent / PARQUET_DIRNAME / f'{file_path.stem}.{digest}.parquet'
+
+
+def convert_csv(file_path):
+    """Convert ``file_path`` to Parquet unless an up to date copy exists."""
+    file_path = Path(file_path)
+    target = parquet_path(file_path)
+    if target.exists() and target.stat().st_mtime >= file_path.stat().st_mtime:
+        return target
+
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    df = apply_schema(pd.read_csv(io.BytesIO(raw)), SCHEMAS.get(file_path.name, {}))
+    # Kept in the Parquet metadata: rows appended to the CSV later start here.
+    df.attrs['csv_bytes'] = len(raw)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(f'.{os.getpid()}.tmp')
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+    return target
+
+
+Fingerprint = namedtuple('Fingerprint', ['size', 'mtime_ns', 'head', 'tail'])
+
+
+def _digest(f, start, end):
+    f.seek(start)
+    return hashlib.sha1(f.read(end - start)).hexdigest()
+
+
+def fingerprint(file_path, size=None):
+    """Size, modification time and digests of the first and last bytes of ``file_path``.
+
+    ``size`` limits the fingerprint to the first ``size`` bytes.
+    """
+    with open(file_path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        size = stat.st_size if size is None else size
+        return Fingerprint(
+            size, stat.st_mtime_ns,
+            _digest(f, 0, min(size, SAMPLE_BYTES)),
+            _digest(f, max(0, size - SAMPLE_BYTES), size),
+        )
+
+
+def is_appended(file_path, old):
+    """Whether ``file_path`` still starts with the bytes fingerprinted as ``old``."""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        return (
+            size > old.size
+            and _digest(f, 0, min(old.size, SAMPLE_BYTES)) == old.head
+            and _digest(f, max(0, old.size - SAMPLE_BYTES), old.size) == old.tail
+        )
+
+
+def read_csv_rows(file_path, start, end, columns):
+    """Parse the rows between byte offsets ``start`` and ``end`` of a CSV file."""
+    file_path = Path(file_path)
+    with open(file_path, 'rb') as f:
+        names = pd.read_csv(io.BytesIO(f.readline()), nrows=0).columns
+        f.seek(start)
+        rows = f.read(end - start)
+    df = pd.read_csv(io.BytesIO(rows), header=None, names=names, usecols=list(columns))
+    return apply_schema(df, SCHEMAS.get(file_path.name, {}))
+
+
+def concat_rows(frame, rows):
+    """``rows`` appended to ``frame``, merging the categories of categorical columns."""
+    columns = {}
+    for col in frame.columns:
+        old, new = frame[col], rows[col]
+        if isinstance(old.dtype, pd.CategoricalDtype) and isinstance(new.dtype, pd.CategoricalDtype):
+            columns[col] = pd.api.types.union_categoricals([old, new], ignore_order=not old.cat.ordered)
+        else:
+            columns[col] = pd.concat([old, new], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def read_dataset(file_path, columns=None):
+    """Read ``file_path`` through its Parquet copy, optionally projecting ``columns``."""
+    return pd.read_parquet(convert_csv(file_path), columns=list(columns) if columns else None)
+
+
+class ReadOnlyFrame(pd.DataFrame):
+    """DataFrame shared between sessions that refuses to be modified in place.
+
+    Filtering, grouping or ``assign`` return ordinary DataFrames, so derived
+    data can be changed freely; copy-on-write keeps the shared buffers intact.
+    """
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(
+            'Shared datasets are read-only; derive a new frame instead, e.g. '
+            'df.assign(...) or df.copy().'
+        )
+
+    __setitem__ = _read_only
+    __delitem__ = _read_only
+    insert = _read_only
+    pop = _read_only
+
+
+class DatasetRegistry:
+    """Datasets loaded once per server process and shared by every session."""
+
+    def __init__(self):
+        self._frames = {}
+        self._complete = set()
+        self._views = {}
+        self._fingerprints = {}
+        self._checked = {}
+        self._listeners = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, file_path, callback):
+        """Call ``callback(rows, version)`` whenever ``file_path`` changes.
+
+        ``rows`` are the appended rows, with every loaded column, or None when
+        the file was replaced and must be loaded again. Callbacks run with the
+        registry locked and must not call it.
+        """
+        with self._lock:
+            self._listeners[str(file_path)].append(callback)
+
+    def version(self, file_path):
+        """Token that changes whenever the loaded contents of ``file_path`` change."""
+        with self._lock:
+            fp = self._fingerprints.get(str(file_path))
+        return None if fp is None else (fp.size, fp.mtime_ns)
+
+    def _forget(self, file_path):
+        self._frames.pop(file_path, None)
+        self._complete.discard(file_path)
+        self._fingerprints.pop(file_path, None)
+        for key in [key for key in self._views if key[0] == file_path]:
+            del self._views[key]
+
+    def _refresh(self, file_path, force=False):
+        old = self._fingerprints.get(file_path)
+        now = time.monotonic()
+        if old is None or (not force and now - self._checked.get(file_path, 0) < REFRESH_INTERVAL):
+            return
+        self._checked[file_path] = now
+
+        stat = os.stat(file_path)
+        if (stat.st_size, stat.st_mtime_ns) == (old.size, old.mtime_ns):
+            return
+
+        new = fingerprint(file_path)
+        frame = self._frames[file_path]
+        if Path(file_path).suffix == '.csv' and is_appended(file_path, old):
+            derived = DERIVED.get(Path(file_path).name, {})
+            with timed('append', file_path) as fields:
+                rows = read_csv_rows(file_path, old.size, new.size, [col for col in frame.columns if col not in derived])
+                for col in frame.columns:
+                    if col in derived:
+                        rows[col] = derived[col][1](rows)
+                fields['rows_out'] = len(rows)
+            self._frames[file_path] = concat_rows(frame, rows)
+            self._fingerprints[file_path] = new
+            for key in [key for key in self._views if key[0] == file_path]:
+                del self._views[key]
+        else:
+            rows = None
+            self._forget(file_path)
+
+        for callback in self._listeners[file_path]:
+            callback(rows, (new.size, new.mtime_ns) if rows is not None else None)
+
+    def _load(self, file_path, columns):
+        frame = self._frames.get(file_path)
+        derived = DERIVED.get(Path(file_path).name, {})
+
+        if columns is None:
+            if file_path not in self._complete:
+                frame = read_dataset(file_path)
+                self._fingerprints[file_path] = fingerprint(file_path, frame.attrs.get('csv_bytes'))
+                frame = frame.drop(columns=list(derived), errors='ignore')
+                self._complete.add(file_path)
+            missing = [col for col in derived if col not in frame.columns]
+        else:
+            missing = [col for col in columns if frame is None or col not in frame.columns]
+
+        sources = [src for col in missing if col in derived for src in derived[col][0]]
+        to_read = [
+            col for col in dict.fromkeys([col for col in missing if col not in derived] + sources)
+            if frame is None or col not in frame.columns
+        ]
+        if to_read:
+            extra = read_dataset(file_path, to_read)
+            if frame is None:
+                # The Parquet copy knows how much of the CSV it holds, which
+                # is where rows appended later start.
+                self._fingerprints[file_path] = fingerprint(file_path, extra.attrs.get('csv_bytes'))
+                frame = extra
+            else:
+                frame = pd.concat([frame, extra], axis=1)
+
+        for col in missing:
+            if col in derived:
+                frame[col] = derived[col][1](frame)
+
+        self._frames[file_path] = frame
+        return ReadOnlyFrame({col: frame[col] for col in (columns or frame.columns)}, copy=False)
+
+    def get(self, file_path, columns=None):
+        """Read-only view of ``columns`` of ``file_path``, loading what is missing."""
+        key = (str(file_path), tuple(columns) if columns else None)
+        with self._lock:
+            # New columns are read from the whole file: bring the loaded ones
+            # up to date first so that every column has the same rows.
+            self._refresh(key[0], force=key not in self._views)
+            view = self._views.get(key)
+            if view is None:
+                view = self._views[key] = self._load(*key)
+            fp = self._fingerprints[key[0]]
+        # Every caller gets its own view, so even writes that slip past
+        # ReadOnlyFrame only ever touch the caller's copy.
+        frame = ReadOnlyFrame(view, copy=False)
+        frame.attrs['version'] = (fp.size, fp.mtime_ns)
+        return frame
+
+    def memory_usage(self):
+        """Bytes held by the loaded columns."""
+        with self._lock:
+            return sum(int(frame.memory_usage(deep=True).sum()) for frame in self._frames.values())
+
+
+@st.cache_resource
+def get_dataset_registry():
+    """The process wide dataset registry."""
+    return DatasetRegistry()
+
+
+def get_data_from_csv(file_path, columns=None):
+    """Load a dataset from ``data/`` keeping only ``columns``.
+
+    The first call converts the CSV into a typed Parquet file; later calls, in
+    this or any other process, only read the requested columns from it. The
+    returned frame is shared with every session and must not be modified.
+    """
+    with timed('load', str(file_path), columns=len(columns) if columns else None) as fields:
+        df = get_dataset_registry().get(file_path, columns)
+        fields['rows_out'] = len(df)
+    return df
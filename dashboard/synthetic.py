@@ -0,0 +1,289 @@
+"""Synthetic datasets following the schemas of the files in ``data/``.
+
+Used by the benchmarks and load tests to exercise the dashboard at several
+times the size of the real data. ``scale`` multiplies the row count of every
+table that grows with history (fires, daily pollutant and ICA series, NDVI
+before each fire); the small lookup tables keep their real size.
+
+    python -m dashboard.synthetic OUT_DIR --scale 10
+
+writes a complete ``data/`` directory of CSV files, including the raw
+inputs of ``dashboard.pipeline`` under ``raw/``.
+"""
+
+import argparse
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dashboard.pipeline import COMUNIDADES_NDVI
+from dashboard.store import MESES, SCHEMAS, add_derived_columns, apply_schema
+
+# Rows at scale 1, close to the real files.
+BASE_ROWS = {
+    'incendios.csv': 50_000,
+    'dias_incendio_andalucia.csv': 17_500,
+    'df_ica_diario.csv': 5_850,
+    'merged_data.csv': 565,
+    'NDVI_previo_incendios.csv': 5_000,
+    'pollutant': 7_000,
+}
+
+# Names in the fire database, by the idcomunidad of COMUNIDADES_NDVI, so the
+# regional partitions join each comunidad's fires with its own NDVI.
+COMUNIDADES = {
+    1: 'Pais Vasco', 2: 'Cataluna', 3: 'Galicia', 4: 'Andalucia', 5: 'Principado de Asturias',
+    6: 'Cantabria', 7: 'La Rioja', 8: 'Region de Murcia', 9: 'Comunidad Valenciana', 10: 'Aragon',
+    11: 'Castilla La Mancha', 13: 'Comunidad Foral de Navarra', 14: 'Extremadura', 15: 'Islas Baleares',
+    16: 'Comunidad de Madrid', 17: 'Castilla y Leon',
+}
+PROVINCIAS_ANDALUCIA = [4, 11, 14, 18, 21, 23, 29, 41]
+NIVELES = ['Buena', 'Razonablemente buena', 'Regular', 'Desfavorable', 'Muy desfavorable', 'Extremadamente desfavorable']
+COLORES_BANDAS = ['lightblue', 'lightgreen', 'yellow', 'orange', 'lightcoral', 'violet']
+LIMITES_BANDAS = {
+    'NO2': [0, 40, 80, 120, 230, 340, 1000],
+    'SO2': [0, 100, 200, 350, 500, 750, 1250],
+    'O3': [0, 50, 100, 130, 240, 380, 800],
+    'PM25': [0, 10, 20, 25, 50, 75, 800],
+    'PM10': [0, 20, 40, 50, 100, 150, 1200],
+}
+# Typical daily mean of each pollutant, in µg/m³.
+NIVEL_MEDIO = {'O3': 60.0, 'SO2': 5.0, 'NO2': 20.0, 'PM25': 12.0, 'PM10': 25.0}
+# Share of fire geometries that are polygons and multipolygons (the rest are
+# points), and of those with a hole, so dashboard.geo simplifies real rings.
+POLIGONOS, MULTIPOLIGONOS, HUECOS = 0.35, 0.15, 0.3
+
+
+def _comunidades(rng, n):
+    """``idcomunidad`` and fire database name of ``n`` random fires."""
+    i = rng.integers(0, len(COMUNIDADES), n)
+    return np.array(list(COMUNIDADES))[i], np.array(list(COMUNIDADES.values()))[i]
+
+
+def _dates(rng, n, start, years):
+    days = rng.integers(0, int(365.25 * years), n)
+    return pd.Timestamp(start) + pd.to_timedelta(days, unit='D')
+
+
+def _incendios(rng, n):
+    fecha = _dates(rng, n, '1968-01-01', 49)
+    idcomunidad, comunidad = _comunidades(rng, n)
+    idprovincia = rng.integers(1, 53, n)
+    return pd.DataFrame({
+        'id': np.arange(n),
+        'idcomunidad': idcomunidad,
+        'comunidad': comunidad,
+        'idprovincia': idprovincia,
+        'provincia': np.char.add('Provincia ', idprovincia.astype(str)),
+        'idmunicipio': rng.integers(1, 1000, n),
+        'anio': fecha.year,
+        'fecha': fecha.strftime('%Y-%m-%d'),
+        'mesdeteccion': np.array(MESES)[fecha.month - 1],
+        'perdidassuperficiales': rng.lognormal(0.5, 2.0, n).round(2),
+    })
+
+
+def _dias_incendio(rng, n):
+    fecha = _dates(rng, n, '2001-01-01', 16)
+    return pd.DataFrame({
+        'fecha': fecha.strftime('%Y-%m-%d'),
+        'idprovincia': rng.choice(PROVINCIAS_ANDALUCIA, n),
+        'idmunicipio': rng.integers(1, 1000, n),
+        'perdidassuperficiales': rng.lognormal(0.0, 2.0, n).round(2),
+    })
+
+
+def _contaminante(rng, n, nombre):
+    days = pd.date_range('2009-01-01', '2016-12-31', freq='D')
+    stations = max(1, math.ceil(n / len(days)))
+    fecha = np.tile(days, stations)[:n]
+    estacion = np.repeat(np.arange(1, stations + 1), len(days))[:n]
+    valor = rng.gamma(2.0, NIVEL_MEDIO[nombre] / 2.0, n)
+    missing = rng.random(n) < 0.25
+    fecha = pd.DatetimeIndex(fecha)
+    return pd.DataFrame({
+        'PROVINCIA': np.array(PROVINCIAS_ANDALUCIA)[estacion % len(PROVINCIAS_ANDALUCIA)],
+        'MUNICIPIO': estacion % 100 + 1,
+        'ESTACION': estacion,
+        'PARAMETRO': 9,
+        'TECNICA': '49',
+        'AÑO': fecha.year,
+        'MES': fecha.month,
+        'DIA': fecha.day,
+        'FECHA': fecha.strftime('%Y-%m-%d'),
+        'VALOR_MEDIO': np.where(missing, np.nan, valor),
+        'VALOR': np.where(missing, valor.round(), np.nan),
+        'TECNICA_hh': np.where(missing, np.nan, 49.0),
+        'TECNICA_dd': np.where(missing, '49', None),
+        'VALOR_FINAL': valor,
+        'CONTAMINANTE': nombre,
+    })
+
+
+def _ica(rng, n):
+    fecha = pd.DatetimeIndex(np.tile(pd.date_range('2001-01-01', '2016-12-31', freq='D'), math.ceil(n / 5844))[:n])
+    incendio = rng.random(n) < 0.65
+    return pd.DataFrame({
+        'FECHA': fecha.strftime('%Y-%m-%d'),
+        'label': rng.choice(NIVELES, n, p=[0.1, 0.25, 0.3, 0.2, 0.1, 0.05]),
+        'anio': fecha.year,
+        'fecha': np.where(incendio, fecha.strftime('%Y-%m-%d'), None),
+        'perdidassuperficiales': np.where(incendio, rng.lognormal(1.0, 2.0, n).round(2), 0.0),
+        'Incendio': np.where(incendio, 'Si', 'No'),
+    })
+
+
+def _merged(rng, n):
+    idcomunidad, comunidad = _comunidades(rng, n)
+    return pd.DataFrame({
+        'idcomunidad': idcomunidad,
+        'comunidad_x': comunidad,
+        'anio': rng.integers(1981, 2017, n),
+        'total': rng.lognormal(8.0, 1.5, n).round(1),
+        'count': rng.integers(13, 15000, n),
+        'comunidad_y': np.array([COMUNIDADES_NDVI[i] for i in idcomunidad]),
+        'ndvi_mean': rng.uniform(0.02, 0.27, n),
+    })
+
+
+def _ring(rng, x, y, radius):
+    # An irregular closed ring around (x, y), counter-clockwise.
+    n = int(rng.integers(6, 25))
+    angle = np.sort(rng.uniform(0, 2 * np.pi, n))
+    r = radius * rng.uniform(0.6, 1.0, n)
+    points = [f'{x + dx:.6f} {y + dy:.6f}' for dx, dy in zip(r * np.cos(angle), r * np.sin(angle))]
+    return '(' + ', '.join([*points, points[0]]) + ')'
+
+
+def _polygon(rng, x, y, radius):
+    rings = [_ring(rng, x, y, radius)]
+    if rng.random() < HUECOS:
+        rings.append(_ring(rng, x, y, radius * 0.3))
+    return '(' + ', '.join(rings) + ')'
+
+
+def _geometries(rng, lon, lat):
+    """WKT around each (lon, lat): points, polygons and multipolygons, some with holes."""
+    kind = rng.random(len(lon))
+    radius = rng.uniform(0.002, 0.03, len(lon))
+    geometries = []
+    for x, y, k, r in zip(lon, lat, kind, radius):
+        if k < POLIGONOS:
+            geometries.append('POLYGON ' + _polygon(rng, x, y, r))
+        elif k < POLIGONOS + MULTIPOLIGONOS:
+            parts = [_polygon(rng, x, y, r), _polygon(rng, x + 2.5 * r, y + rng.uniform(-r, r), r / 2)]
+            geometries.append('MULTIPOLYGON (' + ', '.join(parts) + ')')
+        else:
+            geometries.append(f'POINT ({x:.6f} {y:.6f})')
+    return geometries
+
+
+def _ndvi_previo(rng, n):
+    lon = rng.uniform(-7.5, -1.6, n)
+    lat = rng.uniform(36.0, 38.7, n)
+    return pd.DataFrame({
+        'fortnight': rng.integers(1, 25, n),
+        'anio': rng.integers(2001, 2017, n),
+        'provincia': rng.choice(['Almería', 'Cádiz', 'Córdoba', 'Granada', 'Huelva', 'Jaén', 'Málaga', 'Sevilla'], n),
+        'NDVI_previo': rng.uniform(0.0, 0.5, n),
+        'perdidassuperficiales': rng.lognormal(0.5, 2.0, n).round(2),
+        'geometry': _geometries(rng, lon, lat),
+    })
+
+
+def _ndvi_mensual(rng):
+    ndvi = 0.25 + 0.05 * np.sin(np.arange(12) / 12 * 2 * np.pi)
+    return pd.DataFrame({'month': np.arange(1, 13), 'NDVI': ndvi, 'Mes': MESES, 'mesdeteccion': MESES})
+
+
+def _ndvi_andalucia(rng):
+    ndvi = 0.12 + 0.02 * np.cos(np.arange(12) / 12 * 2 * np.pi)
+    return pd.DataFrame({'mes': np.arange(1, 13), 'ndvi_mean': ndvi, 'mesdeteccion': MESES})
+
+
+def _ndvi_comunidades(rng):
+    nombres = list(COMUNIDADES_NDVI.values())
+    anio, mes = np.meshgrid(np.arange(2001, 2017), np.arange(1, 13), indexing='ij')
+    anio, mes = anio.ravel(), mes.ravel()
+    base = rng.uniform(0.05, 0.3, len(nombres))
+    return pd.DataFrame({
+        'comunidad': np.repeat(nombres, len(anio)),
+        'anio': np.tile(anio, len(nombres)),
+        'mes': np.tile(mes, len(nombres)),
+        'ndvi': (np.repeat(base, len(anio)) + 0.05 * np.sin(np.tile(mes, len(nombres)) / 12 * 2 * np.pi)).round(6),
+    })
+
+
+def _ndvi_incendios(rng, incendios):
+    ids = incendios.loc[incendios['comunidad'] == 'Andalucia', 'id'].to_numpy()
+    lon = rng.uniform(-7.5, -1.6, len(ids))
+    lat = rng.uniform(36.0, 38.7, len(ids))
+    return pd.DataFrame({
+        'id': ids,
+        'NDVI_previo': rng.uniform(0.0, 0.5, len(ids)),
+        'geometry': _geometries(rng, lon, lat),
+    })
+
+
+def _bandas():
+    rows = []
+    for contaminante, limites in LIMITES_BANDAS.items():
+        for i, (label, color) in enumerate(zip(NIVELES, COLORES_BANDAS)):
+            rows.append({'contaminante': contaminante, 'min': limites[i], 'max': limites[i + 1], 'color': color, 'label': label})
+    return pd.DataFrame(rows)
+
+
+def generate_raw(scale=1, seed=0):
+    """CSV-shaped frames (dates as strings, no dtypes) keyed by file name."""
+    rng = np.random.default_rng(seed)
+
+    def rows(name):
+        return max(1, int(BASE_ROWS[name] * scale))
+
+    frames = {
+        'incendios.csv': _incendios(rng, rows('incendios.csv')),
+        'dias_incendio_andalucia.csv': _dias_incendio(rng, rows('dias_incendio_andalucia.csv')),
+        'df_ica_diario.csv': _ica(rng, rows('df_ica_diario.csv')),
+        'merged_data.csv': _merged(rng, rows('merged_data.csv')),
+        'NDVI_previo_incendios.csv': _ndvi_previo(rng, rows('NDVI_previo_incendios.csv')),
+        'NDVI_mensual.csv': _ndvi_mensual(rng),
+        'NDVI_andalucia_mensual.csv': _ndvi_andalucia(rng),
+        'bandas_contaminantes.csv': _bandas(),
+    }
+    for nombre in NIVEL_MEDIO:
+        frames[f'{nombre.lower()}.csv'] = _contaminante(rng, rows('pollutant'), nombre)
+    # Raw inputs of dashboard.pipeline.
+    frames['raw/ndvi_comunidades.csv'] = _ndvi_comunidades(rng)
+    frames['raw/ndvi_incendios.csv'] = _ndvi_incendios(rng, frames['incendios.csv'])
+    return frames
+
+
+def generate(scale=1, seed=0):
+    """Frames as the dataset registry hands them out: typed, with derived columns."""
+    return {
+        name: add_derived_columns(name, apply_schema(df, SCHEMAS.get(name, {})))
+        for name, df in generate_raw(scale, seed).items()
+    }
+
+
+def write_csvs(out_dir, scale=1, seed=0):
+    """Write a full synthetic ``data/`` directory to ``out_dir``."""
+    out_dir = Path(out_dir)
+    for name, df in generate_raw(scale, seed).items():
+        (out_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(out_dir / name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('out_dir', help='directory to write the CSV files to')
+    parser.add_argument('--scale', type=float, default=1, help='row count multiplier (default: 1)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_csvs(args.out_dir, args.scale, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Warm-up of the process wide caches when the server starts.
+
+The first visitor after a deploy would otherwise pay for converting and
+loading every dataset, building the rollups and indexes and the first chart
+builds of both pages. ``Warmup`` does all of it in a background thread:
+it loads the datasets with the columns the pages read, builds the fire cube,
+the year indexes, the fire geometries and the default comunidad, then puts
+the specs of each page's default view in the spec cache. Every step goes
+through the same getters as the pages, so they find everything cached.
+
+    python -m dashboard.warmup -- --server.port 8501
+
+warms up and only then starts ``streamlit run streamlit_app.py`` in the
+same process (extra arguments after ``--`` go to Streamlit), so the server
+does not accept connections before it is ready. With ``--background`` the
+server starts at once and the warm-up runs alongside it. A plain
+``streamlit run`` starts the warm-up from ``streamlit_app.py`` on its first
+script run.
+
+Readiness is ``get_warmup().ready`` (a ``threading.Event``) and
+``get_warmup().status()``; with ``DASHBOARD_READY_FILE`` set, the status is
+also written to that file, as JSON, once the warm-up is over, for readiness
+probes (``test -f``). Steps that fail are logged, reported in the status
+and do not stop the others.
+
+The default view is the one ``dashboard.defaults`` describes, as on the
+pages' first run.
+
+This module only imports the heavy dependencies (pandas, Altair) from the
+warm-up thread, so importing it from the navigation shell stays cheap.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from dashboard.defaults import (
+    COLORES,
+    COLUMNAS_CONTAMINANTE,
+    COLUMNAS_ICA,
+    COLUMNAS_INCENDIOS_NDVI,
+    COLUMNAS_NDVI_MENSUAL,
+    COMUNIDAD,
+    CONTAMINANTE,
+    METODO,
+    VENTANA,
+)
+
+logger = logging.getLogger('dashboard.warmup')
+
+READY_FILE = os.environ.get('DASHBOARD_READY_FILE')
+THREAD = 'warmup'
+
+# Outside a script run every cache lookup warns that the thread has no script
+# run context; the warm-up never has one, nor has the launcher before the
+# server starts.
+logging.getLogger(get_script_run_ctx.__module__).addFilter(
+    lambda record: runtime.exists() and record.threadName != THREAD)
+
+
+def _datasets():
+    from dashboard.geo import get_fire_geometries
+    from dashboard.rollups import get_fire_cube, get_ndvi_previo
+    from dashboard.store import get_data_from_csv
+
+    get_fire_cube('data/incendios.csv')
+    get_data_from_csv('data/merged_data.csv', COLUMNAS_INCENDIOS_NDVI)
+    get_data_from_csv('data/NDVI_mensual.csv', COLUMNAS_NDVI_MENSUAL)
+    get_ndvi_previo('data/NDVI_previo_incendios.csv')
+    get_data_from_csv('data/bandas_contaminantes.csv')
+    get_fire_geometries('data/NDVI_previo_incendios.csv')
+
+
+def _indexes():
+    from dashboard.pollutants import PollutantRegistry
+    from dashboard.timeindex import get_year_index
+
+    get_year_index('data/df_ica_diario.csv', 'anio', COLUMNAS_ICA, by=['Incendio', 'label'])
+    contaminantes = PollutantRegistry(COLUMNAS_CONTAMINANTE)
+    for nombre in contaminantes:
+        contaminantes.index(nombre)
+
+
+def _default_region():
+    from dashboard.regions import get_region, get_regions
+
+    # As the page picks it: COMUNIDAD, or else the first one by name.
+    regiones = get_regions()
+    ids = sorted(regiones, key=lambda i: regiones[i]['nombre'])
+    idcomunidad = next((i for i in ids if regiones[i]['comunidad'] == COMUNIDAD), ids[0] if ids else None)
+    return None if idcomunidad is None else get_region(idcomunidad)
+
+
+def _spain_specs():
+    from dashboard.chart_cache import chart_spec
+    from dashboard.charts import spain
+    from dashboard.geo import get_fire_geometries
+    from dashboard.rollups import get_fire_cube, get_ndvi_previo
+    from dashboard.store import get_data_from_csv
+
+    cubo = get_fire_cube('data/incendios.csv')
+    years = {'from_year': cubo.first_year, 'to_year': cubo.last_year}
+    geometrias = get_fire_geometries('data/NDVI_previo_incendios.csv')
+
+    chart_spec(spain.serious_fires_ndvi, get_data_from_csv('data/NDVI_mensual.csv', COLUMNAS_NDVI_MENSUAL), cubo,
+               colores=COLORES)
+    chart_spec(spain.fires_per_reg_barchart, cubo, **years, colores=COLORES)
+    chart_spec(spain.bubbles, get_data_from_csv('data/merged_data.csv', COLUMNAS_INCENDIOS_NDVI),
+               **years)
+    for vista in (spain.fires_per_5year, spain.fires_per_year):
+        chart_spec(vista, cubo, **years, colores=COLORES)
+    chart_spec(spain.previous_ndvi, get_ndvi_previo('data/NDVI_previo_incendios.csv'), **years)
+    chart_spec(spain.fire_map, geometrias, viewport=geometrias.viewport(None), **years,
+               color=next(iter(spain.COLORES_MAPA)))
+
+
+def _region_specs():
+    from dashboard.chart_cache import chart_spec
+    from dashboard.charts import comunidad
+    from dashboard.ica import STATION
+    from dashboard.pollutants import PollutantRegistry
+    from dashboard.store import get_data_from_csv
+    from dashboard.timeindex import get_year_index
+
+    region = _default_region()
+    if region is None:
+        return
+    chart_spec(comunidad.plot_fire_NDVI_monthly, region.cube, region.ndvi_mensual, colores=COLORES,
+               comunidad=region.comunidad)
+    if not region.calidad_aire:
+        return
+
+    indice = PollutantRegistry(COLUMNAS_CONTAMINANTE).index(CONTAMINANTE)
+    years = {'from_year': indice.first_year, 'to_year': indice.last_year}
+    ica = get_year_index('data/df_ica_diario.csv', 'anio', COLUMNAS_ICA, by=['Incendio', 'label'])
+    filters = {'nombre_contaminante': CONTAMINANTE, **years}
+
+    chart_spec(comunidad.plot_ica_pies, ica, **years)
+    chart_spec(comunidad.plot_graph_contaminant_boxes, region.incendios, get_data_from_csv('data/bandas_contaminantes.csv'),
+               indice, **filters)
+    chart_spec(comunidad.plot_fire_contaminant_monthly, region.cube, indice, **filters, colores=COLORES,
+               comunidad=region.comunidad)
+    chart_spec(comunidad.plot_fire_lag_response, region.incendios, indice.frame, **filters, window=VENTANA)
+
+    estaciones = indice.frame.loc[indice.frame['PROVINCIA'].isin(region.provincias), STATION]
+    if len(estaciones):
+        estacion = tuple(map(int, estaciones.drop_duplicates().sort_values(STATION).iloc[0]))
+        chart_spec(comunidad.plot_station_series, region.incendios, indice, **filters, estacion=estacion,
+                   metodo=METODO)
+
+
+# Steps in order: datasets first, then what is derived from them.
+STEPS = [
+    ('datasets', _datasets),
+    ('indexes', _indexes),
+    ('region', _default_region),
+    ('spain specs', _spain_specs),
+    ('region specs', _region_specs),
+]
+
+
+class Warmup:
+    """Runs ``STEPS`` once in a background thread and tells when it is done."""
+
+    def __init__(self, steps=STEPS, ready_file=READY_FILE):
+        self.steps = steps
+        self.ready_file = ready_file
+        self.ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._started = None
+        self._seconds = {}
+        self._errors = {}
+
+    def start(self):
+        """Start the warm-up unless it already started; returns self."""
+        with self._lock:
+            if self._thread is None:
+                if self.ready_file:
+                    Path(self.ready_file).unlink(missing_ok=True)
+                self._started = time.time()
+                self._thread = threading.Thread(target=self._run, name=THREAD, daemon=True)
+                self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Block until the warm-up is over; returns whether it is."""
+        return self.ready.wait(timeout)
+
+    def _run(self):
+        from dashboard.instrumentation import timed
+
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                with timed('warmup', name):
+                    step()
+            except Exception:
+                self._errors[name] = traceback.format_exc(limit=3)
+                logger.warning('warm-up step %s failed:\n%s', name, self._errors[name])
+            self._seconds[name] = time.perf_counter() - start
+
+        if self.ready_file:
+            tmp = Path(f'{self.ready_file}.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps(self.status(done=True), indent=1))
+            os.replace(tmp, self.ready_file)
+        self.ready.set()
+
+    def status(self, done=None):
+        """Whether the warm-up is over, when it started and each finished step's seconds and error."""
+        return {
+            'ready': self.ready.is_set() if done is None else done,
+            'started': self._started,
+            'steps': {
+                name: {'seconds': self._seconds[name], 'error': self._errors.get(name)}
+                for name, _ in self.steps if name in self._seconds
+            },
+        }
+
+
+@st.cache_resource
+def get_warmup():
+    """The process wide warm-up."""
+    return Warmup()
+
+
+def start_warmup():
+    """Start the process wide warm-up, if it is not running or done yet."""
+    return get_warmup().start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Warm up the dashboard caches, then run streamlit_app.py in the same process.',
+        epilog='Arguments after -- are passed to streamlit run.',
+    )
+    parser.add_argument('--app', default='streamlit_app.py', help='Streamlit entry point (default: streamlit_app.py)')
+    parser.add_argument('--background', action='store_true', help='start the server without waiting for the warm-up')
+    parser.add_argument('streamlit_args', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    extra = args.streamlit_args[1:] if args.streamlit_args[:1] == ['--'] else args.streamlit_args
+
+    warmup = start_warmup()
+    if not args.background:
+        warmup.wait()
+        for name, step in warmup.status()['steps'].items():
+            print(f"warm-up {name:15} {step['seconds']:7.2f} s{' FAILED' if step['error'] else ''}", file=sys.stderr)
+
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', args.app, *extra]
+    return cli.main()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,13 @@
 import streamlit as st
 
+# The pages import pandas and Altair; the shell only starts the cache warm-up
+# (a no-op when `python -m dashboard.warmup` already did it).
+from dashboard.warmup import start_warmup
+
+start_warmup()
+
 country = st.Page("spain.py", title="España", icon="🇪🇸")
-region = st.Page("andalucia.py", title="Andalucía", icon="🏞️")
+region = st.Page("comunidad.py", title="Comunidades", icon="🏞️")
 
 pg = st.navigation({"Dashboards":[country, region]})
 
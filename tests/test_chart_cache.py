@@ -0,0 +1,27 @@
+import altair as alt
+import pandas as pd
+
+from dashboard.chart_cache import chart_to_spec, compact_datasets
+
+
+def test_unreferenced_columns_are_dropped():
+    data = pd.DataFrame({'anio': [2001, 2002], 'total': [3, 4], 'sin_usar': ['a', 'b'], 'ndvi': [0.1, 0.2]})
+    spec = compact_datasets({
+        'data': {'name': 'fuegos'},
+        'transform': [{'filter': 'datum.ndvi > 0'}],
+        'encoding': {'x': {'field': 'anio'}, 'y': {'field': 'total'}},
+        'datasets': {'fuegos': data},
+    })
+    (name, compacted), = spec['datasets'].items()
+    assert list(compacted.columns) == ['anio', 'total', 'ndvi']
+    assert spec['data'] == {'name': name}
+
+
+def test_equal_datasets_are_shipped_once():
+    data = pd.DataFrame({'anio': [2001, 2002], 'total': [3, 4]})
+    bars = alt.Chart(data).mark_bar().encode(x='anio:O', y='total:Q')
+    # A copy is another object with the same contents.
+    line = alt.Chart(data.copy()).mark_line().encode(x='anio:O', y='total:Q')
+    spec = chart_to_spec(bars + line)
+    name, = spec['datasets']
+    assert [layer['data'] for layer in spec['layer']] == [{'name': name}] * 2
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from dashboard.downsample import lttb, minmax
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    x = np.sort(rng.choice(10_000, 3_000, replace=False)).astype(float)
+    return x, np.cumsum(rng.normal(size=len(x)))
+
+
+def test_minmax_keeps_the_extremes_of_every_bucket(series):
+    x, y = series
+    keep = minmax(x, y, 100)
+    assert len(keep) <= 2 * 100 + 2
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+
+    bucket = np.minimum(((x - x[0]) / (x[-1] - x[0]) * 100).astype(int), 99)
+    for b in np.unique(bucket):
+        inside = np.flatnonzero(bucket == b)
+        assert y[inside].max() in y[keep] and y[inside].min() in y[keep]
+
+
+def test_lttb_keeps_one_point_per_bucket(series):
+    x, y = series
+    keep = lttb(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+@pytest.mark.parametrize('method, n', [(minmax, 50), (lttb, 200)])
+def test_short_series_are_kept_whole(series, method, n):
+    x, y = series
+    assert method(x[:100], y[:100], n).tolist() == list(range(100))
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard import ica, synthetic
+from dashboard.pollutants import POLLUTANT_FILES
+
+BANDAS = pd.DataFrame({'min': [40, 0, 80], 'label': ['Regular', 'Buena', 'Mala']})
+
+
+def test_classify_band_edges():
+    values = [0, 39.9, 40, 79.9, 80, 1e6, -0.1, np.nan]
+    assert ica.classify(values, BANDAS).tolist() == [0, 0, 1, 1, 2, 2, -1, -1]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    synthetic.write_csvs(tmp_path, scale=0.02)
+    return tmp_path
+
+
+def test_build_needs_every_pollutant(data_dir):
+    (data_dir / 'o3.csv').unlink()
+    (data_dir / 'df_ica_diario.csv').write_text('kept')
+    with pytest.raises(FileNotFoundError, match='O3'):
+        ica.build(data_dir, force=True)
+    assert (data_dir / 'df_ica_diario.csv').read_text() == 'kept'
+
+
+def test_partial_build_uses_the_other_pollutants(data_dir, capsys):
+    (data_dir / 'o3.csv').unlink()
+    assert ica.build(data_dir, force=True, partial=True)
+    assert 'without O3' in capsys.readouterr().err
+    assert len(pd.read_csv(data_dir / 'df_ica_diario.csv')) > 0
+
+
+def test_partial_build_needs_some_pollutant(data_dir):
+    for path in POLLUTANT_FILES.values():
+        (data_dir / Path(path).name).unlink()
+    with pytest.raises(FileNotFoundError):
+        ica.build(data_dir, force=True, partial=True)
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from dashboard.lags import fire_windows
+
+
+def _naive(fires, series, window):
+    # Per station and day mean, then per fire and offset mean over its province's stations.
+    daily = (
+        series.dropna(subset=['VALOR_FINAL'])
+        .groupby(['PROVINCIA', 'MUNICIPIO', 'ESTACION', 'FECHA'])['VALOR_FINAL'].mean().reset_index()
+    )
+    rows = []
+    for incendio, fire in enumerate(fires.itertuples()):
+        if pd.isna(fire.fecha):
+            continue
+        for offset in range(-window, window + 1):
+            day = daily[(daily['PROVINCIA'] == fire.idprovincia)
+                        & (daily['FECHA'] == fire.fecha + pd.Timedelta(days=offset))]
+            if len(day):
+                rows.append((incendio, offset, day['VALOR_FINAL'].mean(), len(day)))
+    return pd.DataFrame(rows, columns=['incendio', 'offset', 'valor', 'estaciones'])
+
+
+def test_fire_windows_matches_naive_lookup():
+    rng = np.random.default_rng(0)
+    n = 600
+    series = pd.DataFrame({
+        'FECHA': pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 60, n), unit='D'),
+        'PROVINCIA': rng.choice([4, 11, 18], n),
+        'MUNICIPIO': rng.choice([1, 2], n),
+        'ESTACION': rng.choice([1, 2], n),
+        'VALOR_FINAL': np.where(rng.random(n) < 0.1, np.nan, rng.gamma(2.0, 10.0, n)),
+    })
+    fires = pd.DataFrame({
+        # Some fires fall before or after the series, or have no date.
+        'fecha': pd.Timestamp('2009-12-25') + pd.to_timedelta(rng.integers(0, 75, 40), unit='D'),
+        'idprovincia': rng.choice([4, 11, 18, 29], 40),
+    })
+    fires.loc[[3, 17], 'fecha'] = pd.NaT
+
+    result = fire_windows(fires, series, window=5).sort_values(['incendio', 'offset'], ignore_index=True)
+    assert_frame_equal(result, _naive(fires, series, 5), check_dtype=False)
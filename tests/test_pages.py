@@ -0,0 +1,25 @@
+import io
+from pathlib import Path
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from dashboard import pipeline, synthetic
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def small_data(tmp_path, monkeypatch):
+    # At this scale every pollutant series covers a single year.
+    synthetic.write_csvs(tmp_path / 'data', scale=0.05)
+    pipeline.run(tmp_path / 'data', jobs=2, out=io.StringIO())
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / 'data'
+
+
+def test_regional_page_with_single_year_pollutants(small_data):
+    app = AppTest.from_file(str(ROOT / 'comunidad.py'), default_timeout=60).run()
+    assert not app.exception
+    assert not [slider for slider in app.slider if slider.label == 'Año']
+    assert any(caption.value.startswith('Solo hay datos de') for caption in app.caption)
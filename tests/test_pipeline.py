@@ -0,0 +1,69 @@
+import io
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from dashboard import pipeline, synthetic
+
+
+def run(data_dir, **kwargs):
+    return set(pipeline.run(data_dir, jobs=2, out=io.StringIO(), **kwargs))
+
+
+@pytest.fixture(scope='module')
+def built(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp('built')
+    synthetic.write_csvs(data_dir, scale=0.02)
+    assert run(data_dir) == {stage.name for stage in pipeline.stages(data_dir)}
+    return data_dir
+
+
+@pytest.fixture
+def data_dir(built, tmp_path):
+    # A copy keeps the mtimes, and the recorded digests do not depend on the path.
+    shutil.copytree(built, tmp_path / 'data')
+    return tmp_path / 'data'
+
+
+def test_second_run_is_up_to_date(data_dir):
+    assert run(data_dir) == set()
+
+
+def test_touched_input_with_same_contents_is_up_to_date(data_dir):
+    path = data_dir / 'incendios.csv'
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert run(data_dir) == set()
+
+
+def test_changed_input_reruns_its_stages(data_dir):
+    path = data_dir / 'raw' / 'ndvi_comunidades.csv'
+    ndvi = pd.read_csv(path, index_col=0)
+    ndvi.loc[0, 'ndvi'] += 0.1
+    ndvi.to_csv(path)
+    assert run(data_dir) == {'merged_data', 'ndvi_mensual', 'regiones'}
+    assert run(data_dir) == set()
+
+
+def test_changed_input_reruns_downstream_stages(data_dir):
+    path = data_dir / 'incendios.csv'
+    fires = pd.read_csv(path, index_col=0)
+    fires.loc[fires['comunidad'] == 'Andalucia', 'perdidassuperficiales'] += 1
+    fires.to_csv(path)
+    # Stages below one that would run are stale too, even before it ran.
+    expected = {'dias_incendio_andalucia', 'merged_data', 'ndvi_previo_incendios', 'regiones', 'geometrias', 'df_ica_diario'}
+    assert run(data_dir, dry_run=True) == expected
+    assert run(data_dir) == expected
+
+
+def test_missing_output_reruns_its_stage(data_dir):
+    (data_dir / 'NDVI_mensual.csv').unlink()
+    assert run(data_dir, dry_run=True) == {'ndvi_mensual'}
+    assert run(data_dir) == {'ndvi_mensual'}
+    assert (data_dir / 'NDVI_mensual.csv').exists()
+
+
+def test_targets_run_with_their_upstream_stages(data_dir):
+    assert run(data_dir, targets=['df_ica_diario'], force=True) == {'dias_incendio_andalucia', 'df_ica_diario'}
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from dashboard.rollups import SERIOUS_FIRE_HA, FireCube
+from dashboard.store import MESES
+
+
+@pytest.fixture
+def fires():
+    rng = np.random.default_rng(0)
+    n = 2_000
+    hectareas = rng.lognormal(2.0, 2.5, n).round(2)
+    hectareas[rng.random(n) < 0.05] = np.nan
+    mes = rng.choice([*MESES, None], n, p=[0.08] * 12 + [0.04])
+    return pd.DataFrame({
+        'comunidad': rng.choice(['Andalucia', 'Aragon', 'Galicia'], n),
+        # Some years have no fires at all.
+        'anio': rng.choice([1990, 1991, 1993, 1996, 1997, 2000], n),
+        'mesdeteccion': mes,
+        'perdidassuperficiales': hectareas,
+    })
+
+
+def _in_range(fires, from_year, to_year):
+    return fires[fires['anio'].between(from_year, to_year)].assign(
+        perdidassuperficiales=lambda df: df['perdidassuperficiales'].fillna(0))
+
+
+@pytest.mark.parametrize('from_year, to_year', [(1990, 2000), (1991, 1996), (1992, 1992), (1980, 1993), (1999, 2010)])
+def test_per_comunidad_matches_groupby(fires, from_year, to_year):
+    expected = (
+        _in_range(fires, from_year, to_year)
+        .groupby('comunidad')['perdidassuperficiales'].agg(total='count', hectareas='sum')
+        .reset_index()
+    )
+    result = FireCube.from_fires(fires).per_comunidad(from_year, to_year)
+    result = result.assign(comunidad=result['comunidad'].astype(str))
+    assert_frame_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('from_year, to_year', [(1990, 2000), (1991, 1996), (1980, 1993)])
+def test_per_year_and_totals_match_groupby(fires, from_year, to_year):
+    selected = _in_range(fires, from_year, to_year)
+    expected = selected.groupby('anio')['perdidassuperficiales'].agg(total='sum', count='count').reset_index()
+    cube = FireCube.from_fires(fires)
+
+    assert_frame_equal(cube.per_year(from_year, to_year), expected, check_dtype=False)
+    count, hectareas = cube.totals(from_year, to_year)
+    assert count == len(selected)
+    assert hectareas == pytest.approx(selected['perdidassuperficiales'].sum())
+
+
+@pytest.mark.parametrize('comunidad', [None, 'Aragon'])
+def test_per_month_matches_groupby(fires, comunidad):
+    selected = _in_range(fires, 1991, 1997)
+    if comunidad is not None:
+        selected = selected[selected['comunidad'] == comunidad]
+    # Fires without a month only count in the yearly and regional totals.
+    expected = (
+        selected.assign(grave=selected['perdidassuperficiales'] > SERIOUS_FIRE_HA)
+        .groupby('mesdeteccion')
+        .agg(count=('grave', 'size'), graves=('grave', 'sum'), hectareas=('perdidassuperficiales', 'sum'))
+        .reindex(MESES, fill_value=0)
+        .reset_index()
+    )
+    result = FireCube.from_fires(fires).per_month(comunidad, 1991, 1997)
+    assert_frame_equal(result, expected, check_dtype=False)
+
+
+
+def test_merged_equals_cube_of_all_fires(fires):
+    old, new = fires.iloc[:1_500], fires.iloc[1_500:]
+    merged = FireCube.from_fires(old).merged(FireCube.from_fires(new))
+    whole = FireCube.from_fires(fires)
+
+    assert list(merged.comunidades) == list(whole.comunidades)
+    assert (merged.first_year, merged.last_year) == (whole.first_year, whole.last_year)
+    np.testing.assert_array_equal(merged.counts, whole.counts)
+    np.testing.assert_array_equal(merged.graves, whole.graves)
+    np.testing.assert_allclose(merged.hectareas, whole.hectareas)
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from dashboard import store
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(store, 'REFRESH_INTERVAL', 0)
+    return store.DatasetRegistry()
+
+
+def test_appended_rows_are_added_to_the_loaded_columns(tmp_path, registry):
+    path = tmp_path / 'serie.csv'
+    pd.DataFrame({'anio': [2001, 2002], 'valor': [1.5, 2.5], 'nombre': ['a', 'b']}).to_csv(path, index=False)
+    assert registry.get(path, ['anio', 'valor'])['valor'].tolist() == [1.5, 2.5]
+
+    appended = []
+    registry.subscribe(path, lambda rows, version: appended.append(rows))
+    with open(path, 'a') as f:
+        f.write('2003,3.5,c\n')
+
+    frame = registry.get(path, ['anio', 'valor'])
+    assert frame['anio'].tolist() == [2001, 2002, 2003]
+    assert frame['valor'].tolist() == [1.5, 2.5, 3.5]
+    # Only the new rows were parsed, and only the loaded columns.
+    assert [list(rows.columns) for rows in appended] == [['anio', 'valor']]
+    assert appended[0]['anio'].tolist() == [2003]
+
+
+def test_rewritten_file_is_loaded_again(tmp_path, registry):
+    path = tmp_path / 'serie.csv'
+    pd.DataFrame({'anio': [2001, 2002], 'valor': [1.5, 2.5]}).to_csv(path, index=False)
+    registry.get(path)
+
+    appended = []
+    registry.subscribe(path, lambda rows, version: appended.append(rows))
+    pd.DataFrame({'anio': [2001], 'valor': [9.0]}).to_csv(path, index=False)
+
+    assert registry.get(path)['valor'].tolist() == [9.0]
+    assert appended == [None]
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from dashboard.timeindex import YearIndex
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 500
+    valor = rng.gamma(2.0, 10.0, n)
+    valor[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        # Out of order, and 2004 has no rows.
+        'anio': rng.choice([2001, 2002, 2003, 2005, 2006], n),
+        'label': rng.choice(['Buena', 'Regular'], n),
+        'valor': valor,
+    })
+
+
+@pytest.mark.parametrize('from_year, to_year', [(2001, 2006), (2002, 2004), (2004, 2004), (1990, 2002), (2005, 2030), (2010, 2020)])
+def test_slice_is_the_range_in_year_order(frame, from_year, to_year):
+    expected = frame[frame['anio'].between(from_year, to_year)].sort_values('anio', kind='stable')
+    assert_frame_equal(YearIndex(frame, 'anio').slice(from_year, to_year), expected)
+
+
+def test_sorted_frame_slices_without_reordering(frame):
+    frame = frame.sort_values('anio', kind='stable', ignore_index=True)
+    indice = YearIndex(frame, 'anio')
+    assert indice.slice(2000, 2010) is frame
+    assert_frame_equal(indice.slice(2002, 2003), frame[frame['anio'].between(2002, 2003)])
+
+
+@pytest.mark.parametrize('from_year, to_year', [(2001, 2006), (2002, 2005), (1990, 2001)])
+def test_aggregate_matches_groupby(frame, from_year, to_year):
+    selected = frame[frame['anio'].between(from_year, to_year)]
+    expected = selected.groupby('label')['valor'].agg(count='count', sum='sum', mean='mean').reset_index()
+    result = YearIndex(frame, 'anio', by=['label'], value='valor').aggregate(from_year, to_year)
+    assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_empty_frame(frame):
+    indice = YearIndex(frame.iloc[:0], 'anio', by=['label'])
+    assert (indice.first_year, indice.last_year) == (0, -1)
+    assert indice.slice(2001, 2006).empty
+    assert indice.aggregate(2001, 2006).empty
+
+
+def test_single_year(frame):
+    frame = frame[frame['anio'] == 2003]
+    indice = YearIndex(frame, 'anio', by=['label'])
+    assert (indice.first_year, indice.last_year) == (2003, 2003)
+    assert len(indice.slice(2003, 2003)) == len(frame)
+    assert indice.slice(2004, 2006).empty
+    assert indice.aggregate(2000, 2010)['count'].sum() == len(frame)